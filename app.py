@@ -1,17 +1,31 @@
 import os
 import logging
-from flask import Flask, request, jsonify, render_template, send_file, abort
+from flask import Flask, request, jsonify, render_template, send_file, abort, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from video_downloader import VideoDownloader
 from rate_limiter import RateLimiter
+from download_jobs import DownloadJobQueue
+from file_registry import FileRegistry
+from storage_manager import StorageManager, InsufficientStorageError
+from stream_proxy import StreamProxy
+from transcoder import Transcoder, PROFILES as TRANSCODE_PROFILES, AUDIO_CODECS, AUDIO_BITRATES
+from url_normalizer import detect_platform
+from format_index import SINGLE_FILE_PROTOCOLS
 from telegram_sender import initialize_telegram, send_video_to_telegram
 import time
-from urllib.parse import urlparse
+import mimetypes
+from urllib.parse import urlparse, quote
 import threading
+import json
+import uuid
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from models import (db, VideoRequest, VideoInfo, DownloadRecord, ApiStats, RateLimitLog,
                    get_or_create_video_info, log_video_request, update_request_status,
-                   update_api_stats, log_rate_limit_event, get_popular_videos, get_platform_stats)
+                   update_api_stats, log_rate_limit_event, get_popular_videos, get_platform_stats,
+                   log_video_requests_bulk)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -43,8 +57,35 @@ CORS(app,
      methods=['GET', 'POST', 'OPTIONS'])
 
 # Initialize services
-video_downloader = VideoDownloader()
-rate_limiter = RateLimiter()
+# EXTRACTION_HEDGE_DELAY (seconds) enables hedged racing of extraction strategies
+hedge_delay = os.environ.get("EXTRACTION_HEDGE_DELAY")
+# DOWNLOAD_ENGINE_CONFIG (JSON) overrides fragment concurrency and chunk sizes, e.g.
+# {"youtube": {"default": {"concurrent_fragment_downloads": 16}}}
+download_engine = os.environ.get("DOWNLOAD_ENGINE_CONFIG")
+# SCHEDULER_PLATFORM_LIMITS (JSON) caps concurrent jobs per platform, e.g. {"instagram": 2}
+platform_limits = os.environ.get("SCHEDULER_PLATFORM_LIMITS")
+video_downloader = VideoDownloader(hedge_delay=float(hedge_delay) if hedge_delay else None,
+                                   download_engine=json.loads(download_engine) if download_engine else None,
+                                   max_concurrent_jobs=int(os.environ.get("SCHEDULER_MAX_CONCURRENT", 6)),
+                                   platform_concurrency=json.loads(platform_limits) if platform_limits else None)
+# RATE_LIMIT_ALGORITHM: sliding_window (default), gcra or sliding_log (exact, memory grows with requests)
+rate_limiter = RateLimiter(algorithm=os.environ.get("RATE_LIMIT_ALGORITHM", "sliding_window"))
+
+# Background download workers, sized separately from HTTP workers
+download_jobs = DownloadJobQueue(max_workers=int(os.environ.get("DOWNLOAD_WORKERS", 4)))
+
+# Bounded worker pool shared by all batch info requests
+BATCH_MAX_URLS = int(os.environ.get("BATCH_MAX_URLS", 50))
+batch_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("BATCH_WORKERS", 8)),
+                                    thread_name_prefix='batch-info')
+
+# SERVE_OFFLOAD hands file transfers to the front proxy: 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd)
+SERVE_OFFLOAD = os.environ.get("SERVE_OFFLOAD", "").lower()
+SERVE_OFFLOAD_PREFIX = os.environ.get("SERVE_OFFLOAD_PREFIX", "/protected-downloads/")
+app.config['USE_X_SENDFILE'] = SERVE_OFFLOAD == 'x-sendfile'
+
+# Pooled upstream connections for streaming CDN URLs straight to clients
+stream_proxy = StreamProxy(pool_size=int(os.environ.get("STREAM_POOL_SIZE", 32)))
 
 # Initialize Telegram integration
 initialize_telegram()
@@ -52,6 +93,46 @@ initialize_telegram()
 # Store for tracking downloads (will be enhanced with database)
 download_store = {}
 
+# Downloaded files shared by every download ID requesting the same content
+file_registry = FileRegistry()
+
+def evict_download_file(file_path):
+    """Drop every download pointing at a file evicted for space"""
+    for download_id in [i for i, info in list(download_store.items()) if info['file_path'] == file_path]:
+        download_store.pop(download_id, None)
+    file_registry.discard_file(file_path)
+    transcoder.remove_outputs(file_path)
+    
+    if use_database():
+        with app.app_context():
+            try:
+                DownloadRecord.query.filter_by(file_path=file_path).delete()
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error removing download records for evicted file: {str(e)}")
+                db.session.rollback()
+
+# Disk quota for downloads/, least recently served files are evicted first
+storage_manager = StorageManager(
+    directory='downloads',
+    max_bytes=int(os.environ.get("STORAGE_MAX_MB", 10240)) * 1024 ** 2,
+    low_watermark=float(os.environ.get("STORAGE_LOW_WATERMARK", 0.8)),
+    min_free_bytes=int(os.environ.get("STORAGE_MIN_FREE_MB", 512)) * 1024 ** 2,
+    on_evict=evict_download_file
+)
+
+# Telegram uploads, kept off request threads and the CPU-bound transcoder pool
+telegram_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("TELEGRAM_WORKERS", 2)),
+                                       thread_name_prefix='telegram')
+
+# ffmpeg worker pool preparing Telegram-ready and smaller copies off the request path
+transcoder = Transcoder(
+    cache_dir=os.path.join('downloads', 'transcoded'),
+    max_workers=int(os.environ.get("TRANSCODE_WORKERS", 2)),
+    on_output=storage_manager.add,
+    on_remove=storage_manager.remove
+)
+
 # Create database tables if database is configured
 if database_url:
     with app.app_context():
@@ -81,31 +162,16 @@ def validate_url(url):
     """Validate if URL is from supported platforms"""
     try:
         parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        
-        supported_domains = [
-            'youtube.com', 'www.youtube.com', 'youtu.be', 'm.youtube.com',
-            'tiktok.com', 'www.tiktok.com', 'vm.tiktok.com',
-            'instagram.com', 'www.instagram.com'
-        ]
+        if parsed.scheme not in ('http', 'https', ''):
+            return False
         
-        return any(domain.endswith(d) or domain == d for d in supported_domains)
+        return detect_platform(url) != 'unknown'
     except:
         return False
 
 def get_platform_from_url(url):
     """Determine platform from URL"""
-    parsed = urlparse(url)
-    domain = parsed.netloc.lower()
-    
-    if 'youtube.com' in domain or 'youtu.be' in domain:
-        return 'youtube'
-    elif 'tiktok.com' in domain:
-        return 'tiktok'
-    elif 'instagram.com' in domain:
-        return 'instagram'
-    else:
-        return 'unknown'
+    return detect_platform(url)
 
 @app.route('/')
 def index():
@@ -223,6 +289,218 @@ def get_video_info():
             'message': 'An error occurred while processing your request'
         }), 500
 
+@app.route('/api/video/info/batch', methods=['POST'])
+def get_video_info_batch():
+    """Get video metadata for many URLs concurrently"""
+    client_ip = get_client_ip()
+    user_agent = get_user_agent()
+    
+    # Check rate limit
+    if not rate_limiter.is_allowed(client_ip):
+        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'message': 'Too many requests. Please wait before making another request.'
+        }), 429
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('urls'), list) or not data['urls']:
+        return jsonify({
+            'error': 'Invalid request',
+            'message': 'A non-empty list of URLs is required in request body'
+        }), 400
+    
+    urls = data['urls']
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({
+            'error': 'Too many URLs',
+            'message': f'A batch can contain at most {BATCH_MAX_URLS} URLs'
+        }), 400
+    
+    urls = [url.strip() if isinstance(url, str) else '' for url in urls]
+    valid_count = sum(1 for url in urls if url and validate_url(url))
+    
+    # Every extraction counts against the limit, the batch only saves per-request overhead
+    remaining = rate_limiter.get_client_stats(client_ip)['requests_remaining']
+    if valid_count > remaining:
+        logger.warning(f"Rate limit exceeded for IP: {client_ip}, batch of {valid_count} URLs with {remaining} requests left")
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'message': f'Batch needs {valid_count} requests but only {remaining} are left. Please wait or send fewer URLs.'
+        }), 429
+    
+    stream = bool(data.get('stream', False))
+    logger.info(f"Getting video info for batch of {len(urls)} URLs")
+    
+    for _ in range(valid_count):
+        rate_limiter.record_request(client_ip)
+    
+    def fetch_info(index, url):
+        """Extract info for one URL of the batch"""
+        start_time = time.time()
+        platform = get_platform_from_url(url)
+        try:
+            video_info = video_downloader.get_video_info(url)
+        except Exception as e:
+            logger.error(f"Error getting video info for {url}: {str(e)}")
+            video_info = None
+        
+        if not video_info:
+            return {
+                'index': index,
+                'url': url,
+                'success': False,
+                'platform': platform,
+                'error': 'Video not found',
+                'message': 'Could not retrieve video information. The video may be private or unavailable.',
+                'processing_time': time.time() - start_time
+            }
+        
+        return {
+            'index': index,
+            'url': url,
+            'success': True,
+            'platform': platform,
+            'data': video_info,
+            'processing_time': time.time() - start_time
+        }
+    
+    def generate_results():
+        """Yield results as they complete, then log the whole batch"""
+        futures = []
+        for index, url in enumerate(urls):
+            if not url or not validate_url(url):
+                yield {
+                    'index': index,
+                    'url': url,
+                    'success': False,
+                    'platform': get_platform_from_url(url) if url else 'unknown',
+                    'error': 'Unsupported platform',
+                    'message': 'URL must be from YouTube, TikTok, or Instagram',
+                    'processing_time': 0
+                }
+                continue
+            futures.append(batch_executor.submit(fetch_info, index, url))
+        
+        for future in as_completed(futures):
+            yield future.result()
+    
+    def log_batch(results):
+        """Write request logs for the batch in one bulk insert"""
+        if not use_database():
+            return
+        
+        try:
+            log_video_requests_bulk([
+                {
+                    'url': result['url'],
+                    'platform': result['platform'],
+                    'status': 'success' if result['success'] else 'failed',
+                    'error_message': None if result['success'] else result['error'],
+                    'processing_time': result['processing_time'],
+                    'video_info': result.get('data')
+                }
+                for result in results if result['url']
+            ], client_ip, user_agent, 'info')
+        except Exception as e:
+            logger.error(f"Error logging batch requests: {str(e)}")
+            db.session.rollback()
+    
+    if stream:
+        def stream_results():
+            results = []
+            for result in generate_results():
+                results.append(result)
+                yield json.dumps(result) + '\n'
+            log_batch(results)
+        
+        return Response(stream_with_context(stream_results()), mimetype='application/x-ndjson')
+    
+    results = sorted(generate_results(), key=lambda result: result['index'])
+    log_batch(results)
+    
+    successful = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'total': len(results),
+        'successful': successful,
+        'failed': len(results) - successful,
+        'results': results
+    })
+
+@app.route('/api/playlist/entries', methods=['POST'])
+def get_playlist_entries():
+    """Stream playlist or channel entries while pages are fetched"""
+    client_ip = get_client_ip()
+    
+    # Check rate limit
+    if not rate_limiter.is_allowed(client_ip):
+        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'message': 'Too many requests. Please wait before making another request.'
+        }), 429
+    
+    data = request.get_json(silent=True)
+    if not data or 'url' not in data:
+        return jsonify({
+            'error': 'Invalid request',
+            'message': 'URL is required in request body'
+        }), 400
+    
+    url = data['url'].strip()
+    if not url:
+        return jsonify({
+            'error': 'Invalid URL',
+            'message': 'URL cannot be empty'
+        }), 400
+    
+    if not validate_url(url):
+        return jsonify({
+            'error': 'Unsupported platform',
+            'message': 'URL must be from YouTube, TikTok, or Instagram'
+        }), 400
+    
+    limit = data.get('limit')
+    if limit is not None and (not isinstance(limit, int) or limit < 1):
+        return jsonify({
+            'error': 'Invalid limit',
+            'message': 'Limit must be a positive integer'
+        }), 400
+    
+    output_format = data.get('format', 'ndjson')
+    platform = get_platform_from_url(url)
+    logger.info(f"Expanding {platform} playlist URL: {url}")
+    
+    # Record successful request
+    rate_limiter.record_request(client_ip)
+    
+    def generate_ndjson():
+        try:
+            for entry in video_downloader.iter_playlist_entries(url, limit):
+                yield json.dumps(entry) + '\n'
+        except Exception as e:
+            logger.error(f"Error expanding playlist {url}: {str(e)}")
+            yield json.dumps({'error': 'Playlist error', 'message': 'Could not expand playlist'}) + '\n'
+    
+    def generate_json():
+        # Chunked JSON array, written entry by entry
+        yield '{"success": true, "platform": ' + json.dumps(platform) + ', "entries": ['
+        count = 0
+        error = None
+        try:
+            for entry in video_downloader.iter_playlist_entries(url, limit):
+                yield (',' if count else '') + json.dumps(entry)
+                count += 1
+        except Exception as e:
+            logger.error(f"Error expanding playlist {url}: {str(e)}")
+            error = 'Could not expand playlist'
+        yield '], "total": ' + str(count) + ', "error": ' + json.dumps(error) + '}'
+    
+    if output_format == 'json':
+        return Response(stream_with_context(generate_json()), mimetype='application/json')
+    return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+
 @app.route('/api/video/direct-url', methods=['POST'])
 def get_direct_url():
     """Get direct download URL without downloading to server"""
@@ -262,8 +540,11 @@ def get_direct_url():
         platform = get_platform_from_url(url)
         logger.info(f"Getting direct URL for {platform} URL: {url}")
         
-        # Get direct download URL
-        download_info = video_downloader.get_direct_url(url, quality)
+        # Get direct download URL, quality 'all' returns the whole ladder from one extraction
+        if quality == 'all':
+            download_info = video_downloader.get_direct_url_ladder(url)
+        else:
+            download_info = video_downloader.get_direct_url(url, quality)
         
         if not download_info:
             return jsonify({
@@ -287,13 +568,18 @@ def get_direct_url():
             'message': 'An error occurred while processing your request'
         }), 500
 
-@app.route('/api/video/download', methods=['POST'])
-def download_video():
-    """Download video to server and return download ID"""
+@app.route('/api/video/stream', methods=['GET'])
+def stream_video():
+    """Stream video from the source CDN to the client without storing it on the server"""
     client_ip = get_client_ip()
+    url = request.args.get('url', '').strip()
+    quality = request.args.get('quality', 'best')
     
-    # Check rate limit
-    if not rate_limiter.is_allowed(client_ip):
+    # Players issue many Range requests per video, continued ranges are free
+    # only while they are answered from the direct URL cache without extraction
+    exempt = is_continued_range() and bool(url) and video_downloader.is_direct_url_cached(url, quality)
+    
+    if not exempt and not rate_limiter.is_allowed(client_ip):
         logger.warning(f"Rate limit exceeded for IP: {client_ip}")
         return jsonify({
             'error': 'Rate limit exceeded',
@@ -301,20 +587,10 @@ def download_video():
         }), 429
     
     try:
-        data = request.get_json()
-        if not data or 'url' not in data:
-            return jsonify({
-                'error': 'Invalid request',
-                'message': 'URL is required in request body'
-            }), 400
-        
-        url = data['url'].strip()
-        quality = data.get('quality', 'best')
-        
         if not url:
             return jsonify({
-                'error': 'Invalid URL',
-                'message': 'URL cannot be empty'
+                'error': 'Invalid request',
+                'message': 'URL is required as query parameter'
             }), 400
         
         if not validate_url(url):
@@ -323,26 +599,198 @@ def download_video():
                 'message': 'URL must be from YouTube, TikTok, or Instagram'
             }), 400
         
-        platform = get_platform_from_url(url)
-        logger.info(f"Downloading video for {platform} URL: {url}")
+        upstream = None
+        for attempt in range(2):
+            download_info = video_downloader.get_direct_url(url, quality)
+            
+            if not download_info:
+                return jsonify({
+                    'error': 'Video not available',
+                    'message': 'Could not get direct download URL. The video may be private or unavailable.'
+                }), 404
+            
+            # HLS/DASH manifests are playlists, not the video file itself
+            if download_info.get('protocol') not in SINGLE_FILE_PROTOCOLS:
+                return jsonify({
+                    'error': 'Unsupported format',
+                    'message': 'This quality is only available as an HLS/DASH stream, which cannot be proxied as a single file'
+                }), 422
+            
+            upstream = stream_proxy.open(download_info['download_url'], download_info.get('http_headers'), request.headers)
+            if upstream.status_code not in (403, 410):
+                break
+            
+            # Signed CDN URL expired or was rejected, resolve a fresh one
+            logger.info(f"Upstream returned {upstream.status_code} for {url}, refreshing direct URL")
+            upstream.close()
+            video_downloader.invalidate_direct_url(url, quality)
+            
+            # The refresh runs an extraction, which always counts against the limit
+            if exempt:
+                exempt = False
+                if not rate_limiter.is_allowed(client_ip):
+                    logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+                    return jsonify({
+                        'error': 'Rate limit exceeded',
+                        'message': 'Too many requests. Please wait before making another request.'
+                    }), 429
+        
+        if upstream.status_code >= 400 and upstream.status_code != 416:
+            upstream.close()
+            return jsonify({
+                'error': 'Upstream error',
+                'message': f'Source server returned status {upstream.status_code}'
+            }), 502
         
-        # Download video
-        download_info = video_downloader.download_video(url, quality)
+        if not exempt:
+            rate_limiter.record_request(client_ip)
+        
+        headers = stream_proxy.response_headers(upstream)
+        download_name = f"{download_info['title']}.{download_info['file_extension']}"
+        headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(download_name)}"
+        
+        return Response(stream_with_context(stream_proxy.iter_chunks(upstream)),
+                        status=upstream.status_code, headers=headers, direct_passthrough=True)
+        
+    except Exception as e:
+        logger.error(f"Error streaming video: {str(e)}")
+        return jsonify({
+            'error': 'Server error',
+            'message': 'An error occurred while processing your request'
+        }), 500
+
+def release_download_file(download_id, file_path):
+    """Delete a download's file unless other download IDs still reference it"""
+    try:
+        if file_registry.release(download_id, file_path):
+            storage_manager.remove(file_path)
+            transcoder.remove_outputs(file_path)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                logger.info(f"Deleted expired file: {file_path}")
+    except Exception as e:
+        logger.error(f"Error deleting expired file: {str(e)}")
+
+def send_to_telegram(download_info):
+    """Send a downloaded video to Telegram, as a Telegram-ready copy when ffmpeg is available"""
+    def send():
+        try:
+            video_path = download_info['file_path']
+            if transcoder.available:
+                # Sent once the copy is ready, the original is used if transcoding fails
+                video_path = transcoder.submit(video_path, 'telegram').result() or video_path
+            
+            if send_video_to_telegram(video_path, download_info):
+                logger.info(f"Video sent to Telegram successfully: {download_info['download_id']}")
+            else:
+                logger.warning(f"Failed to send video to Telegram: {download_info['download_id']}")
+        except Exception as e:
+            logger.error(f"Error sending video to Telegram: {str(e)}")
+    
+    # Uploads are network bound, they run on their own pool instead of request or transcoder threads
+    telegram_executor.submit(send)
+
+def process_download(url, quality, download_id=None):
+    """Download video, store it and return the public download data"""
+    download_id = download_id or str(uuid.uuid4())
+    
+    # The same video at the same quality is downloaded once and shared while it is on disk
+    content_key = video_downloader.url_normalizer.cache_key(url) + (quality,)
+    download_info = file_registry.acquire(content_key, download_id)
+    reused = download_info is not None
+    
+    if reused:
+        storage_manager.touch(download_info['file_path'])
+    else:
+        # Evict old files first, raises InsufficientStorageError when nothing can be freed
+        storage_manager.ensure_space()
+        
+        download_info = video_downloader.download_video(url, quality, download_id=download_id)
         
         if not download_info:
-            return jsonify({
-                'error': 'Video not available',
-                'message': 'Could not download video. The video may be private or unavailable.'
-            }), 404
+            return None
+        
+        file_registry.register(content_key, download_info)
+        storage_manager.add(download_info['file_path'])
+    
+    response_data, stored = store_download(download_info, quality)
+    
+    # Send video to Telegram, reused files were already sent with their first download
+    if stored and not reused:
+        send_to_telegram(download_info)
+    
+    return response_data
+
+def process_audio_download(url, audio_format=None, audio_bitrate=None, download_id=None):
+    """Download only the audio of a video, converted to audio_format when given"""
+    download_id = download_id or str(uuid.uuid4())
+    quality = f"audio-{audio_format}-{audio_bitrate}k" if audio_format else 'audio'
+    
+    # Outputs are shared per video, format and bitrate while they are on disk
+    content_key = video_downloader.url_normalizer.cache_key(url) + (quality,)
+    download_info = file_registry.acquire(content_key, download_id)
+    
+    if download_info:
+        storage_manager.touch(download_info['file_path'])
+    else:
+        # Identical requests share one download and conversion
+        download_info = video_downloader.single_flight.do(
+            ('audio', content_key),
+            lambda: fetch_audio(url, audio_format, audio_bitrate, download_id)
+        )
         
-        # Store download info in database and memory
-        download_id = download_info['download_id']
+        if not download_info:
+            return None
         
-        # Save to database if available
-        if use_database():
-            try:
-                from models import DownloadRecord, VideoInfo, get_or_create_video_info
-                
+        file_registry.register(content_key, download_info)
+        storage_manager.add(download_info['file_path'])
+    
+    response_data, _ = store_download(download_info, quality)
+    return response_data
+
+def fetch_audio(url, audio_format, audio_bitrate, download_id):
+    """Download the audio stream and convert it in the transcoder pool"""
+    # Evict old files first, raises InsufficientStorageError when nothing can be freed
+    storage_manager.ensure_space()
+    
+    download_info = video_downloader.download_audio(url, download_id=download_id)
+    if not download_info or not audio_format:
+        return download_info
+    
+    source_path = download_info['file_path']
+    output_path = os.path.join('downloads', 'audio', f"{download_info['download_id']}.{audio_bitrate}k.{audio_format}")
+    try:
+        converted_path = transcoder.submit_audio(source_path, output_path, audio_format, audio_bitrate).result()
+    finally:
+        # Only the converted file is kept
+        if os.path.exists(source_path):
+            os.remove(source_path)
+    
+    if not converted_path:
+        return None
+    
+    return {
+        **download_info,
+        'filename': os.path.basename(converted_path),
+        'file_path': converted_path,
+        'file_extension': audio_format,
+        'file_size': os.path.getsize(converted_path),
+        'quality': f"audio-{audio_format}-{audio_bitrate}k"
+    }
+
+def store_download(download_info, quality):
+    """Save download to the database and memory store, returns public data and whether it was new"""
+    download_id = download_info['download_id']
+    
+    # Save to database if available
+    if use_database():
+        try:
+            from models import DownloadRecord, VideoInfo, get_or_create_video_info
+            
+            # Coalesced concurrent requests share one download and its record
+            existing_record = DownloadRecord.query.filter_by(download_id=download_id).first()
+            
+            if not existing_record:
                 # Get or create video info record
                 video_info_record = get_or_create_video_info(download_info)
                 
@@ -353,7 +801,7 @@ def download_video():
                     file_path=download_info['file_path'],
                     file_size=download_info['file_size'],
                     file_extension=download_info['file_extension'],
-                    quality='best',  # Could be extracted from download_info if available
+                    quality=quality,
                     download_method='server_download',
                     expires_at=datetime.utcnow() + timedelta(hours=24)
                 )
@@ -361,43 +809,146 @@ def download_video():
                 db.session.add(download_record)
                 db.session.commit()
                 logger.info(f"Saved download record to database: {download_id}")
-                
-            except Exception as e:
-                logger.error(f"Error saving download record to database: {str(e)}")
-                db.session.rollback()
-        
+            
+        except Exception as e:
+            logger.error(f"Error saving download record to database: {str(e)}")
+            db.session.rollback()
+    
+    # Coalesced concurrent requests share the download, only the first one stores it
+    stored = download_id not in download_store
+    if stored:
         # Also store in memory for backwards compatibility
         download_store[download_id] = {
             **download_info,
             'expires_at': datetime.now() + timedelta(hours=24),
             'download_count': 0
         }
+    
+    # Return info with download URL
+    response_data = download_info.copy()
+    response_data['download_url'] = f"/api/serve/{download_id}"
+    del response_data['file_path']  # Don't expose file path
+    
+    return response_data, stored
+
+def run_download_job(download, job_id):
+    """Run a queued download inside the application context"""
+    with app.app_context():
+        return download(download_id=job_id)
+
+@app.route('/api/video/download', methods=['POST'])
+def download_video():
+    """Download video to server and return download ID"""
+    client_ip = get_client_ip()
+    
+    # Check rate limit
+    if not rate_limiter.is_allowed(client_ip):
+        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'message': 'Too many requests. Please wait before making another request.'
+        }), 429
+    
+    try:
+        data = request.get_json()
+        if not data or 'url' not in data:
+            return jsonify({
+                'error': 'Invalid request',
+                'message': 'URL is required in request body'
+            }), 400
         
-        # Send video to Telegram
-        try:
-            video_path = download_info['file_path']
-            telegram_success = send_video_to_telegram(video_path, download_info)
-            if telegram_success:
-                logger.info(f"Video sent to Telegram successfully: {download_id}")
-            else:
-                logger.warning(f"Failed to send video to Telegram: {download_id}")
-        except Exception as e:
-            logger.error(f"Error sending video to Telegram: {str(e)}")
+        url = data['url'].strip()
+        quality = data.get('quality', 'best')
+        
+        if not url:
+            return jsonify({
+                'error': 'Invalid URL',
+                'message': 'URL cannot be empty'
+            }), 400
+        
+        if not validate_url(url):
+            return jsonify({
+                'error': 'Unsupported platform',
+                'message': 'URL must be from YouTube, TikTok, or Instagram'
+            }), 400
+        
+        platform = get_platform_from_url(url)
+        
+        if quality == 'audio':
+            # Audio mode fetches only the audio stream, optionally converted
+            audio_format = data.get('audio_format')
+            if audio_format and audio_format not in AUDIO_CODECS:
+                return jsonify({
+                    'error': 'Invalid audio format',
+                    'message': f"audio_format must be one of: {', '.join(AUDIO_CODECS)}"
+                }), 400
+            
+            audio_bitrate = data.get('audio_bitrate') or (AUDIO_CODECS[audio_format]['default_bitrate'] if audio_format else None)
+            if audio_format and audio_bitrate not in AUDIO_BITRATES:
+                return jsonify({
+                    'error': 'Invalid audio bitrate',
+                    'message': f"audio_bitrate must be one of: {', '.join(map(str, AUDIO_BITRATES))}"
+                }), 400
+            
+            if audio_format and not transcoder.available:
+                return jsonify({
+                    'error': 'Conversion unavailable',
+                    'message': 'Audio conversion is not available on this server'
+                }), 503
+            
+            download = functools.partial(process_audio_download, url, audio_format, audio_bitrate)
+        else:
+            download = functools.partial(process_download, url, quality)
+        
+        # Job mode: queue the download and return immediately
+        if data.get('async'):
+            job_id = str(uuid.uuid4())
+            logger.info(f"Queueing download job {job_id} for {platform} URL: {url}")
+            
+            job = download_jobs.submit(job_id, lambda: run_download_job(download, job_id),
+                                       url=url, quality=quality, platform=platform)
+            
+            # Record successful request
+            rate_limiter.record_request(client_ip)
+            
+            return jsonify({
+                'success': True,
+                'platform': platform,
+                'data': {
+                    'job_id': job_id,
+                    'download_id': job_id,
+                    'status': job['status'],
+                    'status_url': f"/api/download/status/{job_id}"
+                }
+            }), 202
+        
+        logger.info(f"Downloading video for {platform} URL: {url}")
+        
+        # Download video
+        response_data = download()
+        
+        if not response_data:
+            return jsonify({
+                'error': 'Video not available',
+                'message': 'Could not download video. The video may be private or unavailable.'
+            }), 404
         
         # Record successful request
         rate_limiter.record_request(client_ip)
         
-        # Return info with download URL
-        response_data = download_info.copy()
-        response_data['download_url'] = f"/api/serve/{download_id}"
-        del response_data['file_path']  # Don't expose file path
-        
         return jsonify({
             'success': True,
             'platform': platform,
             'data': response_data
         })
         
+    except InsufficientStorageError as e:
+        logger.error(f"Rejecting download, storage full: {str(e)}")
+        return jsonify({
+            'error': 'Insufficient storage',
+            'message': 'Server storage is full. Please try again later.'
+        }), 507
+        
     except Exception as e:
         logger.error(f"Error downloading video: {str(e)}")
         return jsonify({
@@ -405,6 +956,96 @@ def download_video():
             'message': 'An error occurred while processing your request'
         }), 500
 
+def transcode_status_data(download_id, profile, status):
+    """Build transcode status response data"""
+    data = {
+        'download_id': download_id,
+        'profile': profile,
+        'status': status,
+        'status_url': f"/api/video/transcode/{download_id}/{profile}"
+    }
+    if status == 'done':
+        data['download_url'] = f"/api/serve/{download_id}?profile={profile}"
+    return data
+
+@app.route('/api/video/transcode', methods=['POST'])
+def transcode_video():
+    """Queue a transcoded copy of a downloaded video"""
+    client_ip = get_client_ip()
+    
+    # Check rate limit
+    if not rate_limiter.is_allowed(client_ip):
+        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'message': 'Too many requests. Please wait before making another request.'
+        }), 429
+    
+    try:
+        data = request.get_json()
+        if not data or 'download_id' not in data:
+            return jsonify({
+                'error': 'Invalid request',
+                'message': 'download_id is required in request body'
+            }), 400
+        
+        download_id = data['download_id']
+        profile = data.get('profile', 'faststart')
+        
+        if profile not in TRANSCODE_PROFILES:
+            return jsonify({
+                'error': 'Invalid profile',
+                'message': f"Profile must be one of: {', '.join(TRANSCODE_PROFILES)}"
+            }), 400
+        
+        if not transcoder.available:
+            return jsonify({
+                'error': 'Transcoding unavailable',
+                'message': 'Transcoding is not available on this server'
+            }), 503
+        
+        download_info = download_store.get(download_id)
+        if not download_info or not os.path.exists(download_info['file_path']):
+            return jsonify({
+                'error': 'Download not found',
+                'message': 'Download ID not found or expired'
+            }), 404
+        
+        future = transcoder.submit(download_info['file_path'], profile)
+        status = transcoder.status(download_info['file_path'], profile) if future.done() else 'running'
+        
+        # Record successful request
+        rate_limiter.record_request(client_ip)
+        
+        return jsonify({
+            'success': status != 'failed',
+            'data': transcode_status_data(download_id, profile, status)
+        }), 200 if status == 'done' else 202
+        
+    except Exception as e:
+        logger.error(f"Error queueing transcode: {str(e)}")
+        return jsonify({
+            'error': 'Server error',
+            'message': 'An error occurred while processing your request'
+        }), 500
+
+@app.route('/api/video/transcode/<download_id>/<profile>')
+def get_transcode_status(download_id, profile):
+    """Get status of a transcoded copy"""
+    download_info = download_store.get(download_id)
+    status = transcoder.status(download_info['file_path'], profile) if download_info and profile in TRANSCODE_PROFILES else None
+    
+    if status is None:
+        return jsonify({
+            'error': 'Transcode not found',
+            'message': 'No transcode was requested for this download and profile'
+        }), 404
+    
+    return jsonify({
+        'success': status != 'failed',
+        'data': transcode_status_data(download_id, profile, status)
+    })
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -437,7 +1078,7 @@ def get_supported_platforms():
         },
         'tiktok': {
             'name': 'TikTok', 
-            'domains': ['tiktok.com', 'www.tiktok.com', 'vm.tiktok.com'],
+            'domains': ['tiktok.com', 'www.tiktok.com', 'm.tiktok.com', 'vm.tiktok.com', 'vt.tiktok.com'],
             'icon': 'fab fa-tiktok',
             'color': '#000000'
         },
@@ -505,6 +1146,21 @@ def get_rate_limit_status():
         }
     })
 
+@app.route('/api/performance/stats', methods=['GET'])
+def get_performance_stats():
+    """Get in-process cache and extraction statistics"""
+    return jsonify({
+        'success': True,
+        'data': {
+            **video_downloader.get_performance_stats(),
+            'download_jobs': download_jobs.get_stats(),
+            'file_registry': file_registry.get_stats(),
+            'storage': storage_manager.get_stats(),
+            'stream_proxy': stream_proxy.get_stats(),
+            'transcoder': transcoder.get_stats()
+        }
+    })
+
 @app.route('/api/analytics/stats', methods=['GET'])
 def get_analytics_stats():
     """Get API usage analytics"""
@@ -572,9 +1228,54 @@ def get_analytics_stats():
             'message': 'An error occurred while retrieving analytics'
         }), 500
 
+def is_continued_range():
+    """Check if request resumes or seeks within a transfer that was already started"""
+    range_header = request.headers.get('Range', '').replace(' ', '')
+    return bool(range_header) and not range_header.startswith('bytes=0-')
+
+def is_initial_transfer(response):
+    """Check if response starts a transfer, revalidations and resumed or seeking Range requests do not"""
+    return response.status_code != 304 and not is_continued_range()
+
+def send_download_file(file_path, download_name):
+    """Send downloaded file with Range and conditional GET support, or offload it to the proxy"""
+    mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    
+    if SERVE_OFFLOAD == 'x-accel':
+        # nginx serves the internal location itself, including Range and conditional requests
+        ascii_name = download_name.encode('ascii', 'ignore').decode().replace('"', '') or 'video'
+        response = Response(mimetype=mimetype)
+        # Transcoded and converted audio files live in subdirectories of downloads/
+        relative_path = os.path.relpath(file_path, 'downloads').replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = SERVE_OFFLOAD_PREFIX + quote(relative_path)
+        response.headers['Content-Disposition'] = (f'attachment; filename="{ascii_name}"; '
+                                                   f"filename*=UTF-8''{quote(download_name)}")
+        return response
+    
+    # With X-Sendfile the proxy handles Range itself, Flask only sets the header
+    return send_file(
+        os.path.abspath(file_path),
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mimetype,
+        conditional=not app.config['USE_X_SENDFILE'],
+        etag=True,
+        last_modified=os.path.getmtime(file_path)
+    )
+
 @app.route('/api/serve/<download_id>')
 def serve_video(download_id):
-    """Serve downloaded video file"""
+    """Serve downloaded video file, or a transcoded copy of it with ?profile="""
+    profile = request.args.get('profile')
+    
+    def served_file(file_path, file_extension):
+        """Get path and extension of the requested variant"""
+        if not profile:
+            return file_path, file_extension
+        if profile not in TRANSCODE_PROFILES or transcoder.status(file_path, profile) != 'done':
+            abort(404)
+        return transcoder.output_path(file_path, profile), 'mp4'
+    
     try:
         download_info = None
         
@@ -590,36 +1291,36 @@ def serve_video(download_id):
                     # Check if download has expired
                     if datetime.utcnow() > download_record.expires_at:
                         # Clean up expired download
-                        try:
-                            if os.path.exists(download_record.file_path):
-                                os.remove(download_record.file_path)
-                        except:
-                            pass
+                        release_download_file(download_id, download_record.file_path)
                         db.session.delete(download_record)
                         db.session.commit()
                         abort(404)
                     
                     # Check if file still exists
                     if not os.path.exists(download_record.file_path):
+                        file_registry.release(download_id, download_record.file_path)
                         db.session.delete(download_record)
                         db.session.commit()
                         abort(404)
                     
-                    # Increment download count
-                    download_record.download_count += 1
-                    db.session.commit()
-                    
                     # Get video info for title
                     video_title = download_record.video_info.title if download_record.video_info else "video"
                     
                     # Serve the file
-                    return send_file(
-                        download_record.file_path,
-                        as_attachment=True,
-                        download_name=f"{video_title}.{download_record.file_extension}",
-                        mimetype='application/octet-stream'
-                    )
+                    file_path, file_extension = served_file(download_record.file_path,
+                                                            download_record.file_extension)
+                    response = send_download_file(file_path, f"{video_title}.{file_extension}")
+                    
+                    # Count each transfer once, not every Range request of it
+                    if is_initial_transfer(response):
+                        download_record.download_count += 1
+                        db.session.commit()
+                    storage_manager.touch(file_path)
                     
+                    return response
+                    
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Database error serving video {download_id}: {str(e)}")
         
@@ -632,30 +1333,29 @@ def serve_video(download_id):
         # Check if download has expired
         if datetime.now() > download_info['expires_at']:
             # Clean up expired download
-            try:
-                if os.path.exists(download_info['file_path']):
-                    os.remove(download_info['file_path'])
-            except:
-                pass
+            release_download_file(download_id, download_info['file_path'])
             del download_store[download_id]
             abort(404)
         
         # Check if file still exists
         if not os.path.exists(download_info['file_path']):
+            file_registry.release(download_id, download_info['file_path'])
             del download_store[download_id]
             abort(404)
         
-        # Increment download count
-        download_store[download_id]['download_count'] += 1
-        
         # Serve the file
-        return send_file(
-            download_info['file_path'],
-            as_attachment=True,
-            download_name=f"{download_info['title']}.{download_info['file_extension']}",
-            mimetype='application/octet-stream'
-        )
+        file_path, file_extension = served_file(download_info['file_path'], download_info['file_extension'])
+        response = send_download_file(file_path, f"{download_info['title']}.{file_extension}")
+        
+        # Count each transfer once, not every Range request of it
+        if is_initial_transfer(response):
+            download_store[download_id]['download_count'] += 1
+        storage_manager.touch(file_path)
         
+        return response
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error serving video {download_id}: {str(e)}")
         abort(500)
@@ -664,6 +1364,25 @@ def serve_video(download_id):
 def get_download_status(download_id):
     """Get download status and info"""
     try:
+        # Queued, running and failed jobs are reported from the job queue
+        job = download_jobs.get(download_id)
+        if job and job['status'] != 'done':
+            return jsonify({
+                'success': job['status'] != 'failed',
+                'data': {
+                    'download_id': download_id,
+                    'status': job['status'],
+                    'platform': job['platform'],
+                    'quality': job['quality'],
+                    'error': job['error'],
+                    'created_at': datetime.fromtimestamp(job['created_at']).isoformat()
+                }
+            })
+        
+        # Coalesced jobs finish with the download that was already in flight
+        if job and job['result']:
+            download_id = job['result']['download_id']
+        
         if download_id not in download_store:
             return jsonify({
                 'error': 'Download not found',
@@ -674,6 +1393,7 @@ def get_download_status(download_id):
         
         # Check if download has expired
         if datetime.now() > download_info['expires_at']:
+            release_download_file(download_id, download_info['file_path'])
             del download_store[download_id]
             return jsonify({
                 'error': 'Download expired',
@@ -683,6 +1403,7 @@ def get_download_status(download_id):
         # Return status info
         status_info = {
             'download_id': download_id,
+            'status': 'done',
             'title': download_info['title'],
             'file_extension': download_info['file_extension'],
             'file_size': download_info['file_size'],
@@ -705,6 +1426,73 @@ def get_download_status(download_id):
             'message': 'An error occurred while getting download status'
         }), 500
 
+@app.route('/api/download/status/<download_id>/stream')
+def stream_download_status(download_id):
+    """Stream download status and progress as Server-Sent Events"""
+    progress_tracker = video_downloader.progress_tracker
+    
+    if (download_jobs.get(download_id) is None and progress_tracker.get(download_id) is None
+            and download_id not in download_store):
+        return jsonify({
+            'error': 'Download not found',
+            'message': 'Download ID not found or expired'
+        }), 404
+    
+    def build_event():
+        """Combine job state and byte progress into one event"""
+        job = download_jobs.get(download_id)
+        progress = progress_tracker.get(download_id)
+        
+        if job:
+            status = job['status']
+        elif progress:
+            status = progress['status'] if progress['status'] in ('done', 'failed') else 'running'
+        else:
+            status = 'done' if download_id in download_store else 'failed'
+        
+        event = {
+            'download_id': download_id,
+            'status': status,
+            'progress': {k: v for k, v in progress.items() if k not in ('download_id', 'version')} if progress else None
+        }
+        
+        if status == 'done':
+            result_id = job['result']['download_id'] if job and job['result'] else download_id
+            event['download_url'] = f"/api/serve/{result_id}"
+        elif status == 'failed' and job:
+            event['error'] = job['error']
+        
+        return event, (progress['version'] if progress else None)
+    
+    def generate():
+        deadline = time.time() + 3600
+        last_event = None
+        last_sent = 0
+        
+        while time.time() < deadline:
+            event, version = build_event()
+            
+            if event != last_event:
+                yield f"data: {json.dumps(event)}\n\n"
+                last_event = event
+                last_sent = time.time()
+            elif time.time() - last_sent >= 15:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                last_sent = time.time()
+            
+            if event['status'] in ('done', 'failed'):
+                break
+            
+            if version is None:
+                # Job still queued, no progress record to wait on yet
+                time.sleep(1)
+            else:
+                progress_tracker.wait_for_update(download_id, version, timeout=5)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 def cleanup_expired_downloads():
     """Clean up expired downloads (should be run periodically)"""
     try:
@@ -714,13 +1502,8 @@ def cleanup_expired_downloads():
         for download_id, download_info in download_store.items():
             if current_time > download_info['expires_at']:
                 expired_ids.append(download_id)
-                # Delete file
-                try:
-                    if os.path.exists(download_info['file_path']):
-                        os.remove(download_info['file_path'])
-                        logger.info(f"Deleted expired file: {download_info['file_path']}")
-                except Exception as e:
-                    logger.error(f"Error deleting expired file: {str(e)}")
+                # Delete file once no other download ID shares it
+                release_download_file(download_id, download_info['file_path'])
         
         # Remove from store
         for download_id in expired_ids:
@@ -737,12 +1520,21 @@ def start_cleanup_thread():
     def cleanup_loop():
         while True:
             cleanup_expired_downloads()
+            video_downloader.info_cache.cleanup_expired()
+            video_downloader.direct_url_cache.cleanup_expired()
+            video_downloader.format_indexes.cleanup_expired()
+            download_jobs.cleanup_finished()
+            rate_limiter.cleanup_old_entries()
+            video_downloader.progress_tracker.cleanup_finished()
+            video_downloader.cleanup_partial_downloads()
+            storage_manager.enforce()
             time.sleep(3600)  # Run every hour
     
     cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
     cleanup_thread.start()
 
 # Start cleanup when app starts
+storage_manager.scan()
 start_cleanup_thread()
 
 @app.errorhandler(404)
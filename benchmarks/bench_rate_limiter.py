@@ -0,0 +1,70 @@
+"""
+Microbenchmark of RateLimiter algorithms
+
+Every client sends its full allowance through is_allowed/record_request,
+then a get_client_stats call, the same calls the API makes per request.
+Reports throughput and the memory held by the limiter state.
+
+Usage: python benchmarks/bench_rate_limiter.py [--clients N] [--max-requests N]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter
+
+def simulate(limiter: RateLimiter, client_ids: list, max_requests: int) -> int:
+    """Send every client's allowance, returns the number of requests made"""
+    for client_id in client_ids:
+        for _ in range(max_requests):
+            if limiter.is_allowed(client_id):
+                limiter.record_request(client_id)
+        limiter.get_client_stats(client_id)
+    return len(client_ids) * max_requests
+
+def run(algorithm: str, clients: int, max_requests: int) -> dict:
+    """Run one scenario and return its measurements"""
+    client_ids = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+
+    # Timed without tracemalloc, which slows down every allocation
+    limiter = RateLimiter(max_requests=max_requests, time_window=60, algorithm=algorithm)
+    start = time.perf_counter()
+    operations = simulate(limiter, client_ids, max_requests)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    limiter = RateLimiter(max_requests=max_requests, time_window=60, algorithm=algorithm)
+    baseline = tracemalloc.get_traced_memory()[0]
+    simulate(limiter, client_ids, max_requests)
+    state_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': operations / elapsed,
+        'bytes_per_client': state_bytes / clients
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[10000])
+    parser.add_argument('--max-requests', type=int, nargs='+', default=[10, 100])
+    args = parser.parse_args()
+
+    # Rejections are not part of the measurement
+    logging.disable(logging.WARNING)
+
+    print(f"{'algorithm':<16}{'clients':>10}{'limit':>8}{'ops/s':>14}{'bytes/client':>15}")
+    for max_requests in args.max_requests:
+        for clients in args.clients:
+            for algorithm in RateLimiter.ALGORITHMS:
+                result = run(algorithm, clients, max_requests)
+                print(f"{algorithm:<16}{clients:>10}{max_requests:>8}"
+                      f"{result['ops_per_sec']:>14,.0f}{result['bytes_per_client']:>15,.0f}")
+
+if __name__ == '__main__':
+    main()
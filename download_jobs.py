@@ -0,0 +1,123 @@
+import time
+import threading
+import logging
+from typing import Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class DownloadJobQueue:
+    def __init__(self, max_workers: int = 4, job_ttl: int = 24 * 3600):
+        """
+        Initialize background download job queue
+
+        Args:
+            max_workers: Maximum number of downloads running at once
+            job_ttl: Seconds finished jobs are kept for status lookups
+        """
+        self.max_workers = max_workers
+        self.job_ttl = job_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download-job')
+        self.jobs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, job_id: str, fn: Callable[[], Optional[Dict]], **metadata) -> Dict:
+        """
+        Queue a download job
+
+        Args:
+            job_id: Unique job identifier
+            fn: Function performing the download, returns result data or None on failure
+            **metadata: Extra fields reported with the job status (url, quality, platform)
+
+        Returns:
+            Job status dictionary
+        """
+        job = {
+            **metadata,
+            'job_id': job_id,
+            'status': 'queued',
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'result': None
+        }
+
+        with self.lock:
+            self.jobs[job_id] = job
+
+        self.executor.submit(self._run, job_id, fn)
+        logger.info(f"Queued download job {job_id}")
+        return dict(job)
+
+    def _run(self, job_id: str, fn: Callable[[], Optional[Dict]]) -> None:
+        """Run a job and record its outcome"""
+        self._update(job_id, status='running', started_at=time.time())
+
+        try:
+            result = fn()
+        except Exception as e:
+            logger.error(f"Download job {job_id} failed: {str(e)}")
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+            return
+
+        if result:
+            self._update(job_id, status='done', result=result, finished_at=time.time())
+        else:
+            self._update(job_id, status='failed', error='Could not download video. The video may be private or unavailable.',
+                         finished_at=time.time())
+
+    def _update(self, job_id: str, **fields) -> None:
+        """Update job fields"""
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Get job status
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Copy of the job status dictionary or None if unknown
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def cleanup_finished(self) -> None:
+        """
+        Remove finished jobs older than the job TTL
+        This should be called periodically in a production environment
+        """
+        current_time = time.time()
+
+        with self.lock:
+            expired_ids = [
+                job_id for job_id, job in self.jobs.items()
+                if job['finished_at'] and current_time - job['finished_at'] > self.job_ttl
+            ]
+            for job_id in expired_ids:
+                del self.jobs[job_id]
+
+        logger.debug(f"Cleaned up {len(expired_ids)} finished download jobs")
+
+    def get_stats(self) -> Dict:
+        """
+        Get job queue statistics
+
+        Returns:
+            Dictionary containing job counts by status
+        """
+        with self.lock:
+            counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+            for job in self.jobs.values():
+                counts[job['status']] += 1
+
+        return {
+            'max_workers': self.max_workers,
+            **counts
+        }
@@ -0,0 +1,158 @@
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ProgressTracker:
+    def __init__(self, notify_interval: float = 0.5, record_ttl: int = 3600):
+        """
+        Initialize per-download progress tracking
+
+        Args:
+            notify_interval: Minimum seconds between notifications for byte progress
+            record_ttl: Seconds finished records are kept
+        """
+        self.notify_interval = notify_interval
+        self.record_ttl = record_ttl
+        self.records: Dict[str, Dict] = {}
+        self.condition = threading.Condition()
+
+    def start(self, download_id: str) -> None:
+        """
+        Create progress record for a new download
+
+        Args:
+            download_id: Download identifier
+        """
+        with self.condition:
+            self.records[download_id] = {
+                'download_id': download_id,
+                'status': 'starting',
+                'method': None,
+                'downloaded_bytes': 0,
+                'total_bytes': None,
+                'percent': None,
+                'speed': None,
+                'eta': None,
+                'fragment_index': None,
+                'fragment_count': None,
+                'updated_at': time.time(),
+                'version': 0
+            }
+            self.condition.notify_all()
+
+    def set_method(self, download_id: str, method: str) -> None:
+        """
+        Record the fallback method currently downloading
+
+        Args:
+            download_id: Download identifier
+            method: Strategy name
+        """
+        self._update(download_id, {'method': method, 'status': 'starting', 'downloaded_bytes': 0}, notify=True)
+
+    def update(self, download_id: str, hook_data: Dict) -> None:
+        """
+        Update progress from a yt-dlp progress hook
+
+        Args:
+            download_id: Download identifier
+            hook_data: Dictionary passed to yt-dlp progress hooks
+        """
+        status = hook_data.get('status')
+        total_bytes = hook_data.get('total_bytes') or hook_data.get('total_bytes_estimate')
+        downloaded_bytes = hook_data.get('downloaded_bytes') or 0
+
+        fields = {
+            'status': status,
+            'downloaded_bytes': downloaded_bytes,
+            'total_bytes': total_bytes,
+            'percent': round(downloaded_bytes / total_bytes * 100, 1) if total_bytes else None,
+            'speed': hook_data.get('speed'),
+            'eta': hook_data.get('eta'),
+            'fragment_index': hook_data.get('fragment_index'),
+            'fragment_count': hook_data.get('fragment_count')
+        }
+
+        # Byte progress is throttled, status changes are always published
+        with self.condition:
+            record = self.records.get(download_id)
+            notify = (record is not None and (record['status'] != status or
+                      time.time() - record['updated_at'] >= self.notify_interval))
+        self._update(download_id, fields, notify=notify)
+
+    def finish(self, download_id: str, status: str) -> None:
+        """
+        Mark download as finished
+
+        Args:
+            download_id: Download identifier
+            status: Final status, 'done' or 'failed'
+        """
+        self._update(download_id, {'status': status, 'eta': 0 if status == 'done' else None}, notify=True)
+
+    def _update(self, download_id: str, fields: Dict, notify: bool) -> None:
+        """Update record fields and wake up waiters when notify is set"""
+        with self.condition:
+            record = self.records.get(download_id)
+            if record is None:
+                return
+
+            record.update(fields)
+            if notify:
+                record['updated_at'] = time.time()
+                record['version'] += 1
+                self.condition.notify_all()
+
+    def get(self, download_id: str) -> Optional[Dict]:
+        """
+        Get progress record
+
+        Args:
+            download_id: Download identifier
+
+        Returns:
+            Copy of the progress record or None if unknown
+        """
+        with self.condition:
+            record = self.records.get(download_id)
+            return dict(record) if record else None
+
+    def wait_for_update(self, download_id: str, version: int, timeout: float) -> Optional[Dict]:
+        """
+        Wait until the record changes from the given version
+
+        Args:
+            download_id: Download identifier
+            version: Last version seen by the caller
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Copy of the progress record, unchanged if the timeout expired
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: download_id not in self.records or self.records[download_id]['version'] != version,
+                timeout=timeout
+            )
+            record = self.records.get(download_id)
+            return dict(record) if record else None
+
+    def cleanup_finished(self) -> None:
+        """
+        Remove finished records older than the record TTL
+        This should be called periodically in a production environment
+        """
+        current_time = time.time()
+
+        with self.condition:
+            expired_ids = [
+                download_id for download_id, record in self.records.items()
+                if record['status'] in ('done', 'failed') and current_time - record['updated_at'] > self.record_ttl
+            ]
+            for download_id in expired_ids:
+                del self.records[download_id]
+
+        logger.debug(f"Cleaned up {len(expired_ids)} finished progress records")
@@ -0,0 +1,133 @@
+import time
+import itertools
+import threading
+import logging
+from typing import Dict, Optional
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class DownloadScheduler:
+    # Lower value runs first
+    PRIORITY_INFO = 0
+    PRIORITY_SMALL_DOWNLOAD = 1
+    PRIORITY_DOWNLOAD = 2
+    PRIORITY_LARGE_DOWNLOAD = 3
+
+    PRIORITY_NAMES = {
+        PRIORITY_INFO: 'info',
+        PRIORITY_SMALL_DOWNLOAD: 'small_download',
+        PRIORITY_DOWNLOAD: 'download',
+        PRIORITY_LARGE_DOWNLOAD: 'large_download'
+    }
+
+    def __init__(self, max_concurrent: int = 6, platform_limits: Optional[Dict[str, int]] = None,
+                 default_platform_limit: int = 3, reserved_info_slots: int = 1, metrics_window: int = 200):
+        """
+        Initialize scheduler limiting concurrent extractions and downloads
+
+        Args:
+            max_concurrent: Maximum number of jobs running at once across all platforms
+            platform_limits: Maximum number of jobs running at once per platform
+            default_platform_limit: Limit for platforms not listed in platform_limits
+            reserved_info_slots: Slots only info requests may use, globally and per platform,
+                so long downloads cannot starve them
+            metrics_window: Number of recent queue times kept per priority class
+        """
+        self.max_concurrent = max_concurrent
+        self.platform_limits = platform_limits or {}
+        self.default_platform_limit = default_platform_limit
+        self.reserved_info_slots = min(reserved_info_slots, max_concurrent - 1)
+        self.condition = threading.Condition()
+        self.running_total = 0
+        self.running: Dict[str, int] = defaultdict(int)
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.wait_times = {priority: deque(maxlen=metrics_window) for priority in self.PRIORITY_NAMES}
+        self.completed: Dict[int, int] = defaultdict(int)
+
+    @contextmanager
+    def slot(self, platform: str, priority: int = PRIORITY_DOWNLOAD):
+        """
+        Wait for a free slot and hold it while the job runs
+
+        Jobs start in priority order, FIFO within a priority. A job whose
+        platform is at its limit does not block jobs for other platforms.
+
+        Args:
+            platform: Platform the job talks to
+            priority: Priority class, lower runs first
+        """
+        ticket = (priority, next(self.sequence), platform)
+        queued_at = time.monotonic()
+
+        with self.condition:
+            self.waiting.append(ticket)
+            self.condition.wait_for(lambda: self._can_start(ticket) and self._is_next(ticket))
+            self.waiting.remove(ticket)
+            self.running_total += 1
+            self.running[platform] += 1
+            waited = time.monotonic() - queued_at
+            self.wait_times[priority].append(waited)
+            # Capacity may remain for jobs that were queued behind this one
+            self.condition.notify_all()
+
+        if waited >= 1:
+            logger.info(f"{self.PRIORITY_NAMES.get(priority, priority)} job for {platform} waited {waited:.1f}s for a slot")
+
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.running_total -= 1
+                self.running[platform] -= 1
+                self.completed[priority] += 1
+                self.condition.notify_all()
+
+    def _can_start(self, ticket: tuple) -> bool:
+        """Check global and platform capacity for a ticket, condition must be held"""
+        priority, _, platform = ticket
+        global_limit = self.max_concurrent
+        platform_limit = self.platform_limits.get(platform, self.default_platform_limit)
+        if priority != self.PRIORITY_INFO:
+            global_limit -= self.reserved_info_slots
+            # Downloads keep at least one slot on platforms limited to a single job
+            platform_limit -= min(self.reserved_info_slots, platform_limit - 1)
+        return self.running_total < global_limit and self.running[platform] < platform_limit
+
+    def _is_next(self, ticket: tuple) -> bool:
+        """Check that no startable ticket is ahead of this one, condition must be held"""
+        return not any(other < ticket and self._can_start(other) for other in self.waiting)
+
+    def get_stats(self) -> Dict:
+        """
+        Get scheduler statistics
+
+        Returns:
+            Dictionary containing running jobs and queue times per priority class
+        """
+        with self.condition:
+            queued = defaultdict(int)
+            for priority, _, _ in self.waiting:
+                queued[priority] += 1
+
+            classes = {}
+            for priority, name in self.PRIORITY_NAMES.items():
+                waits = sorted(self.wait_times[priority])
+                classes[name] = {
+                    'queued': queued[priority],
+                    'completed': self.completed[priority],
+                    'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    'p95_wait': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                    'max_wait': round(waits[-1], 3) if waits else 0.0
+                }
+
+            return {
+                'max_concurrent': self.max_concurrent,
+                'running': self.running_total,
+                'running_by_platform': {platform: count for platform, count in self.running.items() if count},
+                'platform_limits': self.platform_limits,
+                'default_platform_limit': self.default_platform_limit,
+                'priorities': classes
+            }
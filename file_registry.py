@@ -0,0 +1,127 @@
+import os
+import threading
+import logging
+from typing import Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class FileRegistry:
+    def __init__(self):
+        """Initialize registry mapping downloaded content to files shared by download IDs"""
+        # file_path -> {'key', 'download_info', 'refs'}
+        self.files: Dict[str, Dict] = {}
+        self.by_key: Dict[Hashable, str] = {}
+        self.owners: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.reused = 0
+        self.misses = 0
+
+    def acquire(self, key: Hashable, download_id: str) -> Optional[Dict]:
+        """
+        Reference an already downloaded file for a new download ID
+
+        Args:
+            key: Content key, (platform, video_id, quality)
+            download_id: Download ID that will reference the file
+
+        Returns:
+            Download info pointing at the existing file or None if it must be downloaded
+        """
+        with self.lock:
+            file_path = self.by_key.get(key)
+            entry = self.files.get(file_path) if file_path else None
+
+            if entry is None or not os.path.exists(file_path):
+                if entry is not None:
+                    # File vanished from disk, forget it so the next request downloads again
+                    self._forget(file_path)
+                self.misses += 1
+                return None
+
+            entry['refs'].add(download_id)
+            self.owners[download_id] = file_path
+            self.reused += 1
+
+        logger.info(f"Reusing downloaded file for {key} as {download_id} ({len(entry['refs'])} references)")
+        return {**entry['download_info'], 'download_id': download_id}
+
+    def register(self, key: Hashable, download_info: Dict) -> None:
+        """
+        Register a freshly downloaded file
+
+        Args:
+            key: Content key, (platform, video_id, quality)
+            download_info: Download info returned by the downloader
+        """
+        file_path = download_info['file_path']
+        download_id = download_info['download_id']
+
+        with self.lock:
+            entry = self.files.get(file_path)
+            if entry is None:
+                entry = {'key': key, 'download_info': dict(download_info), 'refs': set()}
+                self.files[file_path] = entry
+            entry['refs'].add(download_id)
+            self.by_key[key] = file_path
+            self.owners[download_id] = file_path
+
+    def release(self, download_id: str, file_path: str) -> bool:
+        """
+        Drop a download ID's reference to its file
+
+        Args:
+            download_id: Download ID being expired or removed
+            file_path: File the download ID points at
+
+        Returns:
+            True if no other download ID references the file and it can be deleted
+        """
+        with self.lock:
+            file_path = self.owners.pop(download_id, file_path)
+            entry = self.files.get(file_path)
+            if entry is None:
+                return True
+
+            entry['refs'].discard(download_id)
+            if entry['refs']:
+                logger.debug(f"Keeping {file_path}, still referenced by {len(entry['refs'])} downloads")
+                return False
+
+            self._forget(file_path)
+            return True
+
+    def discard_file(self, file_path: str) -> None:
+        """
+        Forget a file deleted outside of reference counting, e.g. evicted for space
+
+        Args:
+            file_path: Path of the deleted file
+        """
+        with self.lock:
+            if file_path in self.files:
+                self._forget(file_path)
+
+    def _forget(self, file_path: str) -> None:
+        """Remove file entry and its key mapping, lock must be held"""
+        entry = self.files.pop(file_path)
+        for download_id in entry['refs']:
+            self.owners.pop(download_id, None)
+        if self.by_key.get(entry['key']) == file_path:
+            del self.by_key[entry['key']]
+
+    def get_stats(self) -> Dict:
+        """
+        Get registry statistics
+
+        Returns:
+            Dictionary containing registry statistics
+        """
+        with self.lock:
+            total = self.reused + self.misses
+            return {
+                'files': len(self.files),
+                'references': len(self.owners),
+                'reused': self.reused,
+                'misses': self.misses,
+                'reuse_rate': round(self.reused / total, 3) if total else 0.0
+            }
@@ -0,0 +1,136 @@
+import re
+import logging
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+HEIGHT_QUALITY_PATTERN = re.compile(r'^(\d+)p$')
+
+# Protocols serving the whole media as one file, as opposed to HLS/DASH manifests
+SINGLE_FILE_PROTOCOLS = ('http', 'https')
+
+def format_protocol(fmt: Dict) -> str:
+    """Get yt-dlp protocol of a format, guessed from its URL if not set"""
+    if fmt.get('protocol'):
+        return fmt['protocol']
+    path = urlparse(fmt.get('url', '')).path
+    if path.endswith('.m3u8'):
+        return 'm3u8'
+    if path.endswith('.mpd'):
+        return 'http_dash_segments'
+    return urlparse(fmt.get('url', '')).scheme
+
+class FormatIndex:
+    def __init__(self, formats: List[Dict]):
+        """
+        Index yt-dlp format table for quality selection without re-extraction
+
+        yt-dlp sorts formats from worst to best, so list position is used as
+        the preference within each group, the same way its selectors do.
+
+        Args:
+            formats: 'formats' list of extracted video info
+        """
+        # Storyboards and other non-media entries cannot be served
+        self.formats = [fmt for fmt in formats if fmt.get('url') and fmt.get('ext') != 'mhtml']
+
+        self.progressive = []
+        self.video_only = []
+        self.audio_only = []
+
+        for fmt in self.formats:
+            has_video = fmt.get('vcodec') != 'none'
+            has_audio = fmt.get('acodec') != 'none'
+
+            if has_video and has_audio:
+                self.progressive.append(fmt)
+            elif has_video:
+                self.video_only.append(fmt)
+            elif has_audio:
+                self.audio_only.append(fmt)
+
+    def select(self, quality: str, protocols: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """
+        Pick the format a quality name selects
+
+        Mirrors VideoDownloader._get_format_selector: 'best', 'worst', '<N>p'
+        (best with height <= N, else best) and 'audio' (best audio-only).
+
+        Args:
+            quality: Quality name
+            protocols: Only consider formats served over these protocols
+
+        Returns:
+            Selected format dictionary or None if nothing matches
+        """
+        if quality == 'audio':
+            audio_only = self._with_protocols(self.audio_only, protocols)
+            return audio_only[-1] if audio_only else None
+        if quality == 'worst':
+            progressive = self._with_protocols(self.progressive, protocols)
+            return progressive[0] if progressive else self._fallback(worst=True, protocols=protocols)
+        if quality == 'best':
+            return self.best(protocols=protocols)
+
+        match = HEIGHT_QUALITY_PATTERN.match(quality or '')
+        max_height = int(match.group(1)) if match else 720
+        return self.best(max_height, protocols) or self.best(protocols=protocols)
+
+    def best(self, max_height: Optional[int] = None, protocols: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """
+        Get best format with both video and audio
+
+        Args:
+            max_height: Only consider formats up to this height
+            protocols: Only consider formats served over these protocols
+
+        Returns:
+            Format dictionary or None if nothing matches
+        """
+        progressive = self._with_protocols(self.progressive, protocols)
+        if max_height is None:
+            return progressive[-1] if progressive else self._fallback(protocols=protocols)
+
+        # Like yt-dlp filters, formats with unknown height do not match a height limit
+        candidates = [fmt for fmt in progressive if fmt.get('height') and fmt['height'] <= max_height]
+        return candidates[-1] if candidates else None
+
+    def _fallback(self, worst: bool = False, protocols: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """yt-dlp falls back to any format when none carries both video and audio"""
+        formats = self._with_protocols(self.formats, protocols)
+        if not formats:
+            return None
+        return formats[0] if worst else formats[-1]
+
+    @staticmethod
+    def _with_protocols(formats: List[Dict], protocols: Optional[Sequence[str]]) -> List[Dict]:
+        """Filter formats by protocol, all formats if protocols is None"""
+        if protocols is None:
+            return formats
+        return [fmt for fmt in formats if format_protocol(fmt) in protocols]
+
+    @staticmethod
+    def describe(fmt: Dict) -> Dict:
+        """
+        Summarize a format by resolution, codec, container and bitrate
+
+        Args:
+            fmt: Format dictionary
+
+        Returns:
+            Dictionary with the indexed format attributes
+        """
+        width, height = fmt.get('width'), fmt.get('height')
+        return {
+            'format_id': fmt.get('format_id', ''),
+            'ext': fmt.get('ext', 'mp4'),
+            'protocol': format_protocol(fmt),
+            'height': height,
+            'resolution': fmt.get('resolution') or (f"{width}x{height}" if width and height else 'Unknown'),
+            'fps': fmt.get('fps') or 0,
+            'vcodec': fmt.get('vcodec'),
+            'acodec': fmt.get('acodec'),
+            'tbr': fmt.get('tbr') or 0,
+            'filesize': fmt.get('filesize') or fmt.get('filesize_approx') or 0
+        }
@@ -0,0 +1,83 @@
+import logging
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+def run_hedged(strategies: List[Tuple[str, Callable]], hedge_delay: float, max_parallel: int = 2,
+               on_finished: Optional[Callable[[], None]] = None) -> Optional[Any]:
+    """
+    Race strategies, starting the next one after a delay or on failure
+
+    The first truthy result wins. Strategies still running at that point
+    are ignored and their results discarded once they finish.
+
+    Args:
+        strategies: List of (name, callable) pairs in preferred order
+        hedge_delay: Seconds to wait for running strategies before starting the next one
+        max_parallel: Maximum number of strategies running at once for this call
+        on_finished: Called once every started strategy has finished, including
+            losers still running after the winner returned
+
+    Returns:
+        First successful result or None if every strategy failed
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix='hedged')
+    running = {}
+    next_index = 0
+
+    try:
+        while True:
+            # Start the next strategy if a slot is free
+            if next_index < len(strategies) and len(running) < max_parallel:
+                name, strategy = strategies[next_index]
+                logger.info(f"Starting hedged strategy {name}")
+                running[executor.submit(strategy)] = name
+                next_index += 1
+
+            if not running:
+                return None
+
+            # Only wait for the hedge delay if another strategy could be started
+            can_start_more = next_index < len(strategies) and len(running) < max_parallel
+            done, _ = wait(running, timeout=hedge_delay if can_start_more else None, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Hedged strategy {name} failed: {str(e)}")
+                    continue
+
+                if result:
+                    logger.info(f"Hedged strategy {name} won")
+                    return result
+
+                logger.warning(f"Hedged strategy {name} returned no result")
+    finally:
+        # Losers keep running in the background but their results are ignored
+        executor.shutdown(wait=False, cancel_futures=True)
+        if on_finished:
+            _notify_when_done(list(running), on_finished)
+
+def _notify_when_done(futures: List, callback: Callable[[], None]) -> None:
+    """Call callback once all futures are done, immediately if they already are"""
+    lock = threading.Lock()
+    pending = [len(futures)]
+
+    def on_done(_):
+        with lock:
+            pending[0] -= 1
+            if pending[0] > 0:
+                return
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in hedged completion callback: {str(e)}")
+
+    if not futures:
+        on_done(None)
+    for future in futures:
+        future.add_done_callback(on_done)
@@ -0,0 +1,58 @@
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Markers of error and block pages served instead of media
+HTML_INDICATORS = [b'<html', b'<!doctype', b'<head>', b'<body>', b'<title>']
+
+def detect_container(head: bytes) -> Optional[str]:
+    """
+    Identify media container from the first bytes of a file
+
+    Args:
+        head: First bytes of the file
+
+    Returns:
+        Container name or None if the signature is unknown
+    """
+    if len(head) >= 8 and head[4:8] in (b'ftyp', b'styp', b'moof', b'moov', b'sidx'):
+        return 'mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm/mkv'
+    if head.startswith(b'RIFF') and head[8:11] == b'AVI':
+        return 'avi'
+    if head.startswith(b'FLV'):
+        return 'flv'
+    if head.startswith(b'OggS'):
+        return 'ogg'
+    if head.startswith(b'ID3') or head[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'mp3'
+    if len(head) >= 189 and head[0] == 0x47 and head[188] == 0x47:
+        # MPEG-TS packets are 188 bytes, each starting with a 0x47 sync byte
+        return 'mpegts'
+    return None
+
+def detect_error_page(head: bytes) -> Optional[str]:
+    """
+    Detect text responses served in place of media
+
+    Args:
+        head: First bytes of the file
+
+    Returns:
+        Description of the detected response or None if it does not look like one
+    """
+    if detect_container(head):
+        return None
+
+    lowered = head[:512].lower()
+    if any(indicator in lowered for indicator in HTML_INDICATORS):
+        return 'HTML page'
+
+    stripped = lowered.lstrip()
+    if stripped.startswith(b'<?xml'):
+        return 'XML document'
+    if stripped[:1] in (b'{', b'['):
+        return 'JSON response'
+    return None
@@ -1,6 +1,6 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import DeclarativeBase
 
 
@@ -191,6 +191,81 @@ def log_video_request(url, platform, quality, client_ip, user_agent, request_typ
     return request_log
 
 
+def get_or_create_video_infos_bulk(video_datas):
+    """Get or create video info records for many videos with one lookup and one insert"""
+    video_datas = [data for data in video_datas if data.get('video_id') and data.get('platform')]
+    if not video_datas:
+        return {}
+    
+    keys = {(data['video_id'], data['platform']) for data in video_datas}
+    existing = VideoInfo.query.filter(
+        tuple_(VideoInfo.video_id, VideoInfo.platform).in_(list(keys))
+    ).all()
+    
+    video_infos = {(video_info.video_id, video_info.platform): video_info for video_info in existing}
+    
+    new_video_infos = []
+    for video_data in video_datas:
+        key = (video_data['video_id'], video_data['platform'])
+        if key in video_infos:
+            continue
+        
+        video_info = VideoInfo(
+            video_id=video_data['video_id'],
+            title=video_data.get('title', ''),
+            description=video_data.get('description', ''),
+            uploader=video_data.get('uploader', ''),
+            duration=video_data.get('duration', 0),
+            view_count=video_data.get('view_count', 0),
+            like_count=video_data.get('like_count', 0),
+            thumbnail_url=video_data.get('thumbnail', ''),
+            platform=video_data['platform'],
+            original_url=video_data.get('webpage_url', ''),
+            upload_date=video_data.get('upload_date', '')
+        )
+        video_infos[key] = video_info
+        new_video_infos.append(video_info)
+    
+    if new_video_infos:
+        db.session.add_all(new_video_infos)
+        db.session.commit()
+    
+    return video_infos
+
+
+def log_video_requests_bulk(request_entries, client_ip, user_agent, request_type):
+    """Log many finished video requests in one insert
+    
+    Each entry is a dict with url, platform, status, error_message,
+    processing_time and optionally the extracted video_info.
+    """
+    video_infos = get_or_create_video_infos_bulk(
+        [entry['video_info'] for entry in request_entries if entry.get('video_info')]
+    )
+    
+    request_logs = []
+    for entry in request_entries:
+        video_data = entry.get('video_info') or {}
+        video_info = video_infos.get((video_data.get('video_id'), video_data.get('platform')))
+        
+        request_logs.append(VideoRequest(
+            url=entry['url'][:500],
+            platform=entry['platform'],
+            quality='N/A',
+            client_ip=client_ip,
+            user_agent=user_agent,
+            request_type=request_type,
+            status=entry['status'],
+            error_message=entry.get('error_message'),
+            processing_time=entry.get('processing_time'),
+            video_info_id=video_info.id if video_info else None
+        ))
+    
+    db.session.add_all(request_logs)
+    db.session.commit()
+    return request_logs
+
+
 def update_request_status(request_log, status, error_message=None, processing_time=None, 
                          video_info_id=None, download_record_id=None):
     """Update request status"""
@@ -1,113 +1,302 @@
+import math
 import time
+import threading
 import logging
-from typing import Dict, List
-from collections import defaultdict, deque
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+class RateLimitAlgorithm(ABC):
+    def __init__(self, max_requests: int, time_window: int):
+        """
+        Base class of rate limiting algorithms, callers hold the limiter's lock
+
+        Args:
+            max_requests: Maximum number of requests allowed
+            time_window: Time window in seconds
+        """
+        self.max_requests = max_requests
+        self.time_window = time_window
+
+    @abstractmethod
+    def is_allowed(self, client_id: str, now: float) -> bool:
+        """
+        Check if client may make a request at time now, without recording it
+
+        Args:
+            client_id: Unique identifier for the client
+            now: Current time in seconds
+
+        Returns:
+            True if request is allowed, False otherwise
+        """
+
+    @abstractmethod
+    def record(self, client_id: str, now: float) -> None:
+        """
+        Count a request made at time now
+
+        Args:
+            client_id: Unique identifier for the client
+            now: Current time in seconds
+        """
+
+    @abstractmethod
+    def usage(self, client_id: str, now: float) -> Tuple[int, float]:
+        """
+        Get client's usage of the limit
+
+        Args:
+            client_id: Unique identifier for the client
+            now: Current time in seconds
+
+        Returns:
+            Requests counted against the limit and seconds until the next request is allowed
+        """
+
+    @abstractmethod
+    def cleanup(self, now: float) -> int:
+        """
+        Drop state of clients that no longer affect any decision
+
+        Args:
+            now: Current time in seconds
+
+        Returns:
+            Number of clients removed
+        """
+
+class SlidingLogAlgorithm(RateLimitAlgorithm):
+    def __init__(self, max_requests: int, time_window: int):
+        """
+        Exact sliding window keeping every request timestamp per client
+
+        Memory per client grows with max_requests.
+
+        Args:
+            max_requests: Maximum number of requests allowed
+            time_window: Time window in seconds
+        """
+        super().__init__(max_requests, time_window)
+        self.requests: Dict[str, deque] = {}
+
+    def is_allowed(self, client_id: str, now: float) -> bool:
+        return self._trim(client_id, now) < self.max_requests
+
+    def record(self, client_id: str, now: float) -> None:
+        self.requests.setdefault(client_id, deque()).append(now)
+        self._trim(client_id, now)
+
+    def usage(self, client_id: str, now: float) -> Tuple[int, float]:
+        requests_made = self._trim(client_id, now)
+        if requests_made < self.max_requests:
+            return requests_made, 0
+        return requests_made, max(0, self.time_window - (now - self.requests[client_id][0]))
+
+    def cleanup(self, now: float) -> int:
+        idle = [client_id for client_id in self.requests if not self._trim(client_id, now)]
+        for client_id in idle:
+            del self.requests[client_id]
+        return len(idle)
+
+    def _trim(self, client_id: str, now: float) -> int:
+        """Remove requests outside the time window, returns the number left"""
+        client_requests = self.requests.get(client_id)
+        if not client_requests:
+            return 0
+        while client_requests and now - client_requests[0] > self.time_window:
+            client_requests.popleft()
+        return len(client_requests)
+
+class SlidingWindowCounterAlgorithm(RateLimitAlgorithm):
+    def __init__(self, max_requests: int, time_window: int):
+        """
+        Approximate sliding window from the counts of the current and previous fixed window
+
+        The previous window's count is weighted by how much of it still
+        overlaps the sliding window, so state per client is two counters
+        and a window start.
+
+        Args:
+            max_requests: Maximum number of requests allowed
+            time_window: Time window in seconds
+        """
+        super().__init__(max_requests, time_window)
+        # client_id -> [window_start, previous_count, current_count]
+        self.windows: Dict[str, list] = {}
+
+    def is_allowed(self, client_id: str, now: float) -> bool:
+        return self._estimate(client_id, now) < self.max_requests
+
+    def record(self, client_id: str, now: float) -> None:
+        window = self.windows.get(client_id)
+        if window is None:
+            self.windows[client_id] = [self._window_start(now), 0, 1]
+            return
+        self._advance(window, now)
+        window[2] += 1
+
+    def usage(self, client_id: str, now: float) -> Tuple[int, float]:
+        estimate = self._estimate(client_id, now)
+        if estimate < self.max_requests:
+            return math.ceil(estimate), 0
+
+        window_start, previous_count, current_count = self.windows[client_id]
+        elapsed = now - window_start
+        if current_count >= self.max_requests:
+            # Blocked until the current window, as the previous one, has decayed enough
+            wait = self.time_window - elapsed + self.time_window * (1 - self.max_requests / current_count)
+        else:
+            wait = self.time_window * (1 - (self.max_requests - current_count) / previous_count) - elapsed
+        return math.ceil(estimate), max(0, wait)
+
+    def cleanup(self, now: float) -> int:
+        idle = [client_id for client_id, window in self.windows.items()
+                if now - window[0] >= 2 * self.time_window]
+        for client_id in idle:
+            del self.windows[client_id]
+        return len(idle)
+
+    def _window_start(self, now: float) -> float:
+        return now - now % self.time_window
+
+    def _advance(self, window: list, now: float) -> None:
+        """Roll the client's counters forward to the window containing now"""
+        window_start = self._window_start(now)
+        if window_start == window[0]:
+            return
+        # Counts older than the previous window no longer overlap the sliding window
+        window[1] = window[2] if window_start - window[0] == self.time_window else 0
+        window[0] = window_start
+        window[2] = 0
+
+    def _estimate(self, client_id: str, now: float) -> float:
+        """Weighted number of requests in the sliding window ending at now"""
+        window = self.windows.get(client_id)
+        if window is None:
+            return 0
+        self._advance(window, now)
+        overlap = 1 - (now - window[0]) / self.time_window
+        return window[1] * overlap + window[2]
+
+class GCRAAlgorithm(RateLimitAlgorithm):
+    def __init__(self, max_requests: int, time_window: int):
+        """
+        Generic cell rate algorithm, a token bucket stored as one timestamp per client
+
+        Requests earn back capacity continuously, one every
+        time_window / max_requests seconds, with bursts of up to max_requests.
+
+        Args:
+            max_requests: Maximum number of requests allowed
+            time_window: Time window in seconds
+        """
+        super().__init__(max_requests, time_window)
+        self.emission_interval = time_window / max_requests
+        self.burst_tolerance = time_window - self.emission_interval
+        # client_id -> theoretical arrival time of the next request
+        self.arrival_times: Dict[str, float] = {}
+
+    def is_allowed(self, client_id: str, now: float) -> bool:
+        return self.arrival_times.get(client_id, now) - now <= self.burst_tolerance
+
+    def record(self, client_id: str, now: float) -> None:
+        self.arrival_times[client_id] = max(self.arrival_times.get(client_id, now), now) + self.emission_interval
+
+    def usage(self, client_id: str, now: float) -> Tuple[int, float]:
+        backlog = max(0, self.arrival_times.get(client_id, now) - now)
+        # Rounded first so float error does not count an extra request
+        requests_made = min(self.max_requests, math.ceil(round(backlog / self.emission_interval, 6)))
+        return requests_made, max(0, backlog - self.burst_tolerance)
+
+    def cleanup(self, now: float) -> int:
+        idle = [client_id for client_id, arrival_time in self.arrival_times.items() if arrival_time <= now]
+        for client_id in idle:
+            del self.arrival_times[client_id]
+        return len(idle)
+
 class RateLimiter:
-    def __init__(self, max_requests: int = 10, time_window: int = 60):
+    ALGORITHMS = {
+        'sliding_log': SlidingLogAlgorithm,
+        'sliding_window': SlidingWindowCounterAlgorithm,
+        'gcra': GCRAAlgorithm
+    }
+
+    def __init__(self, max_requests: int = 10, time_window: int = 60, algorithm: str = 'sliding_window'):
         """
         Initialize rate limiter
-        
+
         Args:
             max_requests: Maximum number of requests allowed
             time_window: Time window in seconds
+            algorithm: 'sliding_window' (approximate, constant memory per client),
+                'gcra' (token bucket, constant memory per client) or
+                'sliding_log' (exact, one timestamp per request)
         """
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests: Dict[str, deque] = defaultdict(deque)
-        
+        self.algorithm_name = algorithm
+        self.algorithm = self.ALGORITHMS[algorithm](max_requests, time_window)
+        self.lock = threading.Lock()
+
     def is_allowed(self, client_id: str) -> bool:
         """
         Check if client is allowed to make a request
-        
+
         Args:
             client_id: Unique identifier for the client (usually IP address)
-            
+
         Returns:
             True if request is allowed, False otherwise
         """
-        current_time = time.time()
-        client_requests = self.requests[client_id]
-        
-        # Remove old requests outside the time window
-        while client_requests and current_time - client_requests[0] > self.time_window:
-            client_requests.popleft()
-        
-        # Check if client has exceeded the limit
-        if len(client_requests) >= self.max_requests:
-            logger.warning(f"Rate limit exceeded for client {client_id}: {len(client_requests)} requests in {self.time_window}s")
-            return False
-        
-        return True
-    
+        with self.lock:
+            allowed = self.algorithm.is_allowed(client_id, time.time())
+
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for client {client_id}: {self.max_requests} requests in {self.time_window}s")
+        return allowed
+
     def record_request(self, client_id: str) -> None:
         """
         Record a request for the client
-        
+
         Args:
             client_id: Unique identifier for the client
         """
-        current_time = time.time()
-        self.requests[client_id].append(current_time)
-        
-        # Clean up old requests to prevent memory buildup
-        client_requests = self.requests[client_id]
-        while client_requests and current_time - client_requests[0] > self.time_window:
-            client_requests.popleft()
-    
+        with self.lock:
+            self.algorithm.record(client_id, time.time())
+
     def get_client_stats(self, client_id: str) -> Dict:
         """
         Get statistics for a specific client
-        
+
         Args:
             client_id: Unique identifier for the client
-            
+
         Returns:
             Dictionary containing client statistics
         """
-        current_time = time.time()
-        client_requests = self.requests[client_id]
-        
-        # Remove old requests
-        while client_requests and current_time - client_requests[0] > self.time_window:
-            client_requests.popleft()
-        
-        remaining_requests = max(0, self.max_requests - len(client_requests))
-        
-        # Calculate time until next request is allowed
-        time_until_reset = 0
-        if client_requests and len(client_requests) >= self.max_requests:
-            oldest_request = client_requests[0]
-            time_until_reset = max(0, self.time_window - (current_time - oldest_request))
-        
+        with self.lock:
+            requests_made, time_until_reset = self.algorithm.usage(client_id, time.time())
+
         return {
-            'requests_made': len(client_requests),
-            'requests_remaining': remaining_requests,
+            'requests_made': requests_made,
+            'requests_remaining': max(0, self.max_requests - requests_made),
             'time_until_reset': time_until_reset,
             'time_window': self.time_window
         }
-    
+
     def cleanup_old_entries(self) -> None:
         """
         Clean up old entries to prevent memory buildup
         This should be called periodically in a production environment
         """
-        current_time = time.time()
-        clients_to_remove = []
-        
-        for client_id, client_requests in self.requests.items():
-            # Remove old requests
-            while client_requests and current_time - client_requests[0] > self.time_window:
-                client_requests.popleft()
-            
-            # If no recent requests, mark client for removal
-            if not client_requests:
-                clients_to_remove.append(client_id)
-        
-        # Remove clients with no recent requests
-        for client_id in clients_to_remove:
-            del self.requests[client_id]
-        
-        logger.debug(f"Cleaned up {len(clients_to_remove)} inactive clients")
+        with self.lock:
+            removed = self.algorithm.cleanup(time.time())
+
+        logger.debug(f"Cleaned up {removed} inactive clients")
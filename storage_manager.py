@@ -0,0 +1,207 @@
+import os
+import shutil
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def is_partial_file(name: str) -> bool:
+    """Check if a downloaded file name is a partial or not yet renamed per-format download"""
+    name_parts = name.split('.')
+    return (name.endswith(('.part', '.ytdl')) or '.part-Frag' in name
+            or (len(name_parts) > 2 and name_parts[1].startswith('f')))
+
+class InsufficientStorageError(Exception):
+    """Raised when no space can be freed for a new download"""
+
+class StorageManager:
+    def __init__(self, directory: str = 'downloads', max_bytes: int = 10 * 1024 ** 3,
+                 low_watermark: float = 0.8, min_free_bytes: int = 512 * 1024 ** 2,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Initialize disk quota enforcement for the downloads directory
+
+        Args:
+            directory: Directory holding downloaded files
+            max_bytes: High watermark, eviction starts when tracked files exceed it
+            low_watermark: Fraction of max_bytes eviction frees space down to
+            min_free_bytes: Free space kept on the volume regardless of max_bytes
+            on_evict: Called with the file path before an evicted file is deleted
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_bytes = int(max_bytes * low_watermark)
+        self.min_free_bytes = min_free_bytes
+        self.on_evict = on_evict
+        # file_path -> size, ordered from least to most recently served
+        self.files: OrderedDict = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejections = 0
+
+    def scan(self) -> None:
+        """
+        Track files already in the directory and its subdirectories, oldest first
+        Should be called once at startup
+        """
+        if not os.path.isdir(self.directory):
+            return
+
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                # Leftovers of interrupted downloads and transcodes, cleaned up elsewhere.
+                # Only downloads sit at the top level, transcoded names like x.faststart.mp4
+                # would look like per-format files
+                if '.tmp.' in name or (root == self.directory and is_partial_file(name)):
+                    continue
+                file_path = os.path.join(root, name)
+                stat = os.stat(file_path)
+                found.append((stat.st_mtime, file_path, stat.st_size))
+
+        with self.lock:
+            for _, file_path, size in sorted(found):
+                self._track(file_path, size)
+
+        logger.info(f"Tracking {len(found)} files, {self.total_bytes} bytes in {self.directory}")
+        self.enforce()
+
+    def add(self, file_path: str) -> None:
+        """
+        Track a newly downloaded file and evict older files if over quota
+
+        Args:
+            file_path: Path of the downloaded file
+        """
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return
+
+        with self.lock:
+            self._track(file_path, size)
+
+        self.enforce()
+
+    def touch(self, file_path: str) -> None:
+        """
+        Mark file as recently served
+
+        Args:
+            file_path: Path of the served file
+        """
+        with self.lock:
+            if file_path in self.files:
+                self.files.move_to_end(file_path)
+
+    def remove(self, file_path: str) -> None:
+        """
+        Stop tracking a file deleted elsewhere
+
+        Args:
+            file_path: Path of the deleted file
+        """
+        with self.lock:
+            size = self.files.pop(file_path, None)
+            if size is not None:
+                self.total_bytes -= size
+
+    def ensure_space(self) -> None:
+        """
+        Make room for a new download
+
+        Raises:
+            InsufficientStorageError: If usage stays above the high watermark after eviction
+        """
+        self.enforce()
+
+        if self._over_high_watermark():
+            with self.lock:
+                self.rejections += 1
+            raise InsufficientStorageError('No storage space available for new downloads')
+
+    def enforce(self) -> List[str]:
+        """
+        Evict least recently served files once usage crosses the high watermark
+
+        Returns:
+            List of evicted file paths
+        """
+        if not self._over_high_watermark():
+            return []
+
+        evicted = []
+        while True:
+            with self.lock:
+                if not self.files or (self.total_bytes <= self.low_bytes and self._free_bytes() >= self.min_free_bytes):
+                    break
+                file_path, size = self.files.popitem(last=False)
+                self.total_bytes -= size
+                self.evictions += 1
+                self.evicted_bytes += size
+
+            self._evict(file_path)
+            evicted.append(file_path)
+
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} files, {self.total_bytes} bytes in use")
+        return evicted
+
+    def _evict(self, file_path: str) -> None:
+        """Notify owner of an evicted file and delete it"""
+        if self.on_evict:
+            try:
+                self.on_evict(file_path)
+            except Exception as e:
+                logger.error(f"Error handling eviction of {file_path}: {str(e)}")
+
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                logger.info(f"Evicted file: {file_path}")
+        except Exception as e:
+            logger.error(f"Error deleting evicted file: {str(e)}")
+
+    def _track(self, file_path: str, size: int) -> None:
+        """Add or refresh a file entry, lock must be held"""
+        previous_size = self.files.pop(file_path, None)
+        if previous_size is not None:
+            self.total_bytes -= previous_size
+        self.files[file_path] = size
+        self.total_bytes += size
+
+    def _over_high_watermark(self) -> bool:
+        """Check tracked usage and volume free space against the limits"""
+        with self.lock:
+            total_bytes = self.total_bytes
+        return total_bytes > self.max_bytes or self._free_bytes() < self.min_free_bytes
+
+    def _free_bytes(self) -> int:
+        """Get free space on the volume holding the directory"""
+        try:
+            return shutil.disk_usage(self.directory).free
+        except OSError:
+            return self.min_free_bytes
+
+    def get_stats(self) -> Dict:
+        """
+        Get storage statistics
+
+        Returns:
+            Dictionary containing storage statistics
+        """
+        with self.lock:
+            return {
+                'files': len(self.files),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'low_watermark_bytes': self.low_bytes,
+                'free_bytes': self._free_bytes(),
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'rejections': self.rejections
+            }
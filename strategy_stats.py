@@ -0,0 +1,135 @@
+import random
+import threading
+import logging
+from typing import Callable, Dict, List, Tuple
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+class StrategyStats:
+    def __init__(self, window: int = 50, min_samples: int = 5, explore_rate: float = 0.1):
+        """
+        Initialize per-platform strategy statistics
+
+        Args:
+            window: Number of recent attempts kept per strategy
+            min_samples: Attempts needed before a strategy can be skipped
+            explore_rate: Probability of still trying a skipped strategy
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.attempts: Dict[Tuple[str, str, str], deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self.lock = threading.Lock()
+
+    def record(self, platform: str, label: str, name: str, success: bool, latency: float) -> None:
+        """
+        Record the outcome of a strategy attempt
+
+        Args:
+            platform: Platform the URL belongs to
+            label: Strategy chain, e.g. 'extraction' or 'download'
+            name: Strategy name
+            success: Whether the strategy produced a result
+            latency: Time spent in the strategy in seconds
+        """
+        with self.lock:
+            self.attempts[(platform, label, name)].append((success, latency))
+
+    def record_run(self, platform: str, label: str, outcomes: List[Tuple[str, bool, float]]) -> None:
+        """
+        Record the attempts of one run through a strategy chain
+
+        A run where every strategy failed usually means the video itself is
+        unavailable (private, deleted), so it says nothing about the
+        strategies and is not recorded.
+
+        Args:
+            platform: Platform the URL belongs to
+            label: Strategy chain, e.g. 'extraction' or 'download'
+            outcomes: (strategy name, success, latency) of each finished attempt
+        """
+        if not any(success for _, success, _ in outcomes):
+            logger.debug(f"Not recording {label} run for {platform}, every strategy failed")
+            return
+
+        for name, success, latency in outcomes:
+            self.record(platform, label, name, success, latency)
+
+    def _summary(self, key: Tuple[str, str, str]) -> Dict:
+        """Summarize recent attempts for a strategy, caller holds the lock"""
+        attempts = self.attempts.get(key, ())
+        successes = sum(1 for success, _ in attempts if success)
+        return {
+            'attempts': len(attempts),
+            'successes': successes,
+            'failures': len(attempts) - successes,
+            'avg_latency': sum(latency for _, latency in attempts) / len(attempts) if attempts else 0
+        }
+
+    def order(self, platform: str, label: str, methods: List[Callable]) -> List[Callable]:
+        """
+        Order strategies by recent performance on a platform
+
+        Each strategy gets a Thompson sample of its success rate; strategies
+        with no success in the last min_samples attempts are skipped unless
+        picked for exploration. Strategies without data keep their place.
+
+        Args:
+            platform: Platform the URL belongs to
+            label: Strategy chain
+            methods: Strategies in their default order
+
+        Returns:
+            Strategies in the order they should be tried
+        """
+        ranked = []
+        skipped = []
+
+        with self.lock:
+            for position, method in enumerate(methods):
+                summary = self._summary((platform, label, method.__name__))
+
+                if summary['attempts'] >= self.min_samples and summary['successes'] == 0:
+                    skipped.append(method)
+                    continue
+
+                score = random.betavariate(summary['successes'] + 1, summary['failures'] + 1)
+                if summary['attempts'] == 0:
+                    # Untried strategies keep the default order ahead of poorly scoring ones
+                    score = 0.5
+                ranked.append((-score, summary['avg_latency'], position, method))
+
+        ordered = [method for _, _, _, method in sorted(ranked, key=lambda item: item[:3])]
+
+        for method in skipped:
+            if not ordered or random.random() < self.explore_rate:
+                ordered.append(method)
+            else:
+                logger.debug(f"Skipping {label} strategy {method.__name__} for {platform}")
+
+        return ordered
+
+    def get_stats(self) -> Dict:
+        """
+        Get statistics for all strategies
+
+        Returns:
+            Dictionary of platform -> chain -> strategy statistics
+        """
+        stats = {}
+
+        with self.lock:
+            for key in sorted(self.attempts):
+                platform, label, name = key
+                summary = self._summary(key)
+                stats.setdefault(platform, {}).setdefault(label, []).append({
+                    'strategy': name,
+                    'attempts': summary['attempts'],
+                    'successes': summary['successes'],
+                    'success_rate': round(summary['successes'] / summary['attempts'] * 100, 2) if summary['attempts'] > 0 else 0,
+                    'avg_latency': round(summary['avg_latency'], 3),
+                    'skipped': summary['attempts'] >= self.min_samples and summary['successes'] == 0
+                })
+
+        return stats
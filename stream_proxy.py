@@ -0,0 +1,133 @@
+import threading
+import logging
+from typing import Dict, Iterator, Mapping
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+class StreamProxy:
+    # Client headers forwarded upstream so seeking, resuming and revalidation work end to end
+    FORWARDED_REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+    FORWARDED_RESPONSE_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges',
+                                  'ETag', 'Last-Modified')
+
+    def __init__(self, pool_size: int = 32, chunk_size: int = 64 * 1024,
+                 connect_timeout: float = 10, read_timeout: float = 30):
+        """
+        Initialize streaming proxy for CDN video URLs
+
+        Args:
+            pool_size: Maximum number of pooled upstream connections per host
+            chunk_size: Bytes read from upstream per chunk
+            connect_timeout: Upstream connect timeout in seconds
+            read_timeout: Upstream read timeout in seconds
+        """
+        self.chunk_size = chunk_size
+        self.timeout = (connect_timeout, read_timeout)
+
+        # One session keeps TCP/TLS connections to the CDNs alive between requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.2, allowed_methods=['GET'])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.lock = threading.Lock()
+        self.active_streams = 0
+        self.total_streams = 0
+        self.bytes_streamed = 0
+        self.upstream_errors = 0
+
+    def open(self, download_url: str, http_headers: Mapping[str, str], client_headers: Mapping[str, str]) -> requests.Response:
+        """
+        Open streaming request to the upstream URL
+
+        Args:
+            download_url: Direct media URL
+            http_headers: Headers the extractor requires for the URL
+            client_headers: Headers of the incoming client request
+
+        Returns:
+            Upstream response with the body not yet read
+        """
+        headers = dict(http_headers or {})
+        for name in self.FORWARDED_REQUEST_HEADERS:
+            if client_headers.get(name):
+                headers[name] = client_headers[name]
+        # Bytes are relayed untouched, so the body must not be content-encoded
+        headers['Accept-Encoding'] = 'identity'
+
+        response = self.session.get(download_url, headers=headers, stream=True, timeout=self.timeout)
+        if response.status_code >= 400:
+            with self.lock:
+                self.upstream_errors += 1
+        return response
+
+    def response_headers(self, upstream: requests.Response) -> Dict[str, str]:
+        """
+        Get headers to relay to the client
+
+        Args:
+            upstream: Upstream response
+
+        Returns:
+            Dictionary of relayed headers
+        """
+        headers = {name: upstream.headers[name] for name in self.FORWARDED_RESPONSE_HEADERS if name in upstream.headers}
+        headers.setdefault('Accept-Ranges', 'bytes')
+        return headers
+
+    def iter_chunks(self, upstream: requests.Response) -> Iterator[bytes]:
+        """
+        Relay upstream body to the client
+
+        The next chunk is read from upstream only after the server has written
+        the previous one to the client, so a slow client slows the upstream
+        read instead of filling memory.
+
+        Args:
+            upstream: Upstream response
+
+        Yields:
+            Body chunks
+        """
+        with self.lock:
+            self.active_streams += 1
+            self.total_streams += 1
+
+        streamed = 0
+        try:
+            for chunk in upstream.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    streamed += len(chunk)
+                    yield chunk
+        except requests.RequestException as e:
+            logger.warning(f"Upstream stream interrupted after {streamed} bytes: {str(e)}")
+            with self.lock:
+                self.upstream_errors += 1
+        finally:
+            upstream.close()
+            with self.lock:
+                self.active_streams -= 1
+                self.bytes_streamed += streamed
+
+    def get_stats(self) -> Dict:
+        """
+        Get streaming statistics
+
+        Returns:
+            Dictionary containing streaming statistics
+        """
+        with self.lock:
+            return {
+                'active_streams': self.active_streams,
+                'total_streams': self.total_streams,
+                'bytes_streamed': self.bytes_streamed,
+                'upstream_errors': self.upstream_errors
+            }
@@ -0,0 +1,318 @@
+import os
+import json
+import shutil
+import threading
+import subprocess
+import logging
+import functools
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Telegram bots can send videos up to 50MB with sendVideo
+TELEGRAM_MAX_BYTES = 50 * 1024 * 1024
+
+# Codecs MP4 can carry as-is, such sources only need a remux
+MP4_VIDEO_CODECS = ('h264', 'hevc')
+MP4_AUDIO_CODECS = ('aac', 'mp3')
+
+PROFILES = {
+    'faststart': 'Remux to MP4 with the index up front, re-encode only incompatible codecs',
+    'telegram': f'Inline-playable MP4 under {TELEGRAM_MAX_BYTES // (1024 * 1024)}MB',
+    'low': '480p H.264 for low-bandwidth clients',
+}
+
+# Audio output formats: ffmpeg encoder and muxer, source codecs copied without re-encoding, default kbps
+AUDIO_CODECS = {
+    'm4a': {'encoder': 'aac', 'muxer': 'ipod', 'copy_codecs': ('aac',), 'default_bitrate': 128},
+    'mp3': {'encoder': 'libmp3lame', 'muxer': 'mp3', 'copy_codecs': ('mp3',), 'default_bitrate': 192},
+    'opus': {'encoder': 'libopus', 'muxer': 'opus', 'copy_codecs': ('opus',), 'default_bitrate': 96},
+}
+AUDIO_BITRATES = (64, 96, 128, 160, 192, 256, 320)
+
+class Transcoder:
+    def __init__(self, cache_dir: str = os.path.join('downloads', 'transcoded'), max_workers: int = 2,
+                 threads_per_job: int = 2, timeout: int = 1800, on_output: Optional[Callable[[str], None]] = None,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        """
+        Initialize background transcoding with ffmpeg
+
+        Each job runs in its own ffmpeg process. The worker pool only bounds
+        how many run at once, so CPU use stays at max_workers * threads_per_job
+        cores and API workers never encode.
+
+        Args:
+            cache_dir: Directory keeping transcoded outputs between requests and restarts
+            max_workers: Maximum number of ffmpeg processes running at once
+            threads_per_job: Encoder threads per ffmpeg process
+            timeout: Seconds before a job is killed
+            on_output: Called with the output path after a new file was written
+            on_remove: Called with the output path after a cached file was deleted
+        """
+        self.cache_dir = cache_dir
+        self.threads_per_job = threads_per_job
+        self.timeout = timeout
+        self.on_output = on_output
+        self.on_remove = on_remove
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.ffprobe = shutil.which('ffprobe')
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='transcode')
+        self.max_workers = max_workers
+        self.jobs: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.cache_hits = 0
+
+        if not self.available:
+            logger.warning("ffmpeg/ffprobe not found, transcoding is disabled")
+
+    @property
+    def available(self) -> bool:
+        """Check if ffmpeg and ffprobe are installed"""
+        return bool(self.ffmpeg and self.ffprobe)
+
+    def output_path(self, source_path: str, profile: str) -> str:
+        """
+        Get cache path of a transcoded file
+
+        Args:
+            source_path: Downloaded file
+            profile: Profile name
+
+        Returns:
+            Output file path
+        """
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f"{name}.{profile}.mp4")
+
+    def submit(self, source_path: str, profile: str) -> Future:
+        """
+        Queue a transcode, identical jobs in flight or cached outputs are shared
+
+        Args:
+            source_path: Downloaded file
+            profile: Profile name from PROFILES
+
+        Returns:
+            Future resolving to the output path, or None if transcoding failed
+        """
+        output_path = self.output_path(source_path, profile)
+        return self._submit(source_path, output_path, functools.partial(self._build_command, profile=profile),
+                            TELEGRAM_MAX_BYTES if profile == 'telegram' else None)
+
+    def submit_audio(self, source_path: str, output_path: str, codec: str, bitrate: int) -> Future:
+        """
+        Queue conversion of a downloaded file to an audio-only file
+
+        Args:
+            source_path: Downloaded audio or video file
+            output_path: Path of the audio file, identical in-flight conversions are shared
+            codec: Output format from AUDIO_CODECS
+            bitrate: Target bitrate in kbps
+
+        Returns:
+            Future resolving to the output path, or None if conversion failed
+        """
+        return self._submit(source_path, output_path,
+                            functools.partial(self._build_audio_command, codec=codec, bitrate=bitrate))
+
+    def _submit(self, source_path: str, output_path: str, build_command: Callable,
+                max_bytes: Optional[int] = None) -> Future:
+        """Queue a job producing output_path unless the file is cached or already in flight"""
+        if not self.available:
+            future = Future()
+            future.set_result(None)
+            return future
+
+        with self.lock:
+            if os.path.exists(output_path):
+                self.cache_hits += 1
+                future = Future()
+                future.set_result(output_path)
+                return future
+
+            future = self.jobs.get(output_path)
+            if future is not None and not (future.done() and not future.result()):
+                return future
+
+            future = self.executor.submit(self._run, source_path, output_path, build_command, max_bytes)
+            self.jobs[output_path] = future
+
+        # Finished outputs are found on disk, only running and failed jobs are kept
+        future.add_done_callback(functools.partial(self._forget_job, output_path))
+        return future
+
+    def _forget_job(self, output_path: str, future: Future) -> None:
+        """Drop a successful job unless a newer one replaced it"""
+        with self.lock:
+            if future.result() and self.jobs.get(output_path) is future:
+                del self.jobs[output_path]
+
+    def status(self, source_path: str, profile: str) -> Optional[str]:
+        """
+        Get transcode status
+
+        Args:
+            source_path: Downloaded file
+            profile: Profile name
+
+        Returns:
+            'done', 'running', 'failed' or None if never requested
+        """
+        output_path = self.output_path(source_path, profile)
+        if os.path.exists(output_path):
+            return 'done'
+
+        with self.lock:
+            future = self.jobs.get(output_path)
+        if future is None:
+            return None
+        return 'running' if not future.done() else 'failed'
+
+    def remove_outputs(self, source_path: str) -> None:
+        """
+        Delete cached outputs of a source file that is being removed
+
+        Args:
+            source_path: Downloaded file
+        """
+        for profile in PROFILES:
+            output_path = self.output_path(source_path, profile)
+            with self.lock:
+                self.jobs.pop(output_path, None)
+            try:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                    if self.on_remove:
+                        self.on_remove(output_path)
+            except OSError as e:
+                logger.warning(f"Error removing transcoded file {output_path}: {str(e)}")
+
+    def _run(self, source_path: str, output_path: str, build_command: Callable,
+             max_bytes: Optional[int] = None) -> Optional[str]:
+        """Probe source, run ffmpeg and move the result into the cache"""
+        if not os.path.exists(source_path):
+            logger.error(f"Transcode source not found: {source_path}")
+            return None
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        root, ext = os.path.splitext(output_path)
+        tmp_path = f"{root}.tmp{ext}"
+
+        try:
+            probe = self._probe(source_path)
+            command = build_command(source_path, tmp_path, probe)
+            logger.info(f"Transcoding {os.path.basename(source_path)} to {os.path.basename(output_path)}")
+            subprocess.run(command, check=True, capture_output=True, timeout=self.timeout)
+
+            if max_bytes and os.path.getsize(tmp_path) > max_bytes:
+                raise ValueError(f"output is {os.path.getsize(tmp_path)} bytes, above the limit of {max_bytes}")
+
+            os.replace(tmp_path, output_path)
+        except subprocess.CalledProcessError as e:
+            self._fail(tmp_path, f"ffmpeg failed for {source_path}: {e.stderr.decode(errors='ignore')[-500:]}")
+            return None
+        except Exception as e:
+            self._fail(tmp_path, f"Error transcoding {source_path}: {str(e)}")
+            return None
+
+        with self.lock:
+            self.completed += 1
+
+        if self.on_output:
+            self.on_output(output_path)
+        return output_path
+
+    def _fail(self, tmp_path: str, message: str) -> None:
+        """Record failed job and remove its partial output"""
+        logger.error(message)
+        with self.lock:
+            self.failed += 1
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def _probe(self, source_path: str) -> Dict:
+        """Read codecs, duration and size of the source with ffprobe"""
+        result = subprocess.run(
+            [self.ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', source_path],
+            check=True, capture_output=True, timeout=60
+        )
+        data = json.loads(result.stdout or b'{}')
+        streams = data.get('streams', [])
+        video = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+        audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), {})
+
+        return {
+            'video_codec': video.get('codec_name'),
+            'audio_codec': audio.get('codec_name'),
+            'audio_kbps': int(audio.get('bit_rate') or 0) // 1000,
+            'height': video.get('height') or 0,
+            'duration': float(data.get('format', {}).get('duration') or 0),
+            'size': os.path.getsize(source_path)
+        }
+
+    def _build_command(self, source_path: str, output_path: str, probe: Dict, profile: str) -> List[str]:
+        """Build ffmpeg command line for a profile"""
+        remuxable = (probe['video_codec'] in MP4_VIDEO_CODECS and
+                     probe['audio_codec'] in MP4_AUDIO_CODECS + (None,))
+        encode_h264 = ['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p']
+
+        if profile == 'faststart' or (profile == 'telegram' and remuxable and probe['size'] <= TELEGRAM_MAX_BYTES):
+            codec_args = ['-c', 'copy'] if remuxable else encode_h264 + ['-crf', '23', '-c:a', 'aac', '-b:a', '128k']
+        elif profile == 'telegram':
+            # Bitrate budget from duration, keeping 8% headroom for container overhead
+            audio_kbps = 96
+            total_kbps = TELEGRAM_MAX_BYTES * 8 / 1000 * 0.92 / max(probe['duration'], 1)
+            video_kbps = int(max(total_kbps - audio_kbps, 150))
+            codec_args = encode_h264 + [
+                '-b:v', f'{video_kbps}k', '-maxrate', f'{video_kbps}k', '-bufsize', f'{video_kbps * 2}k',
+                '-vf', "scale=-2:'min(720,ih)'", '-c:a', 'aac', '-b:a', f'{audio_kbps}k'
+            ]
+        elif profile == 'low':
+            codec_args = encode_h264 + ['-crf', '28', '-vf', "scale=-2:'min(480,ih)'", '-c:a', 'aac', '-b:a', '96k']
+        else:
+            raise ValueError(f"Unknown transcode profile: {profile}")
+
+        return [
+            self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', source_path,
+            '-map', '0:v:0', '-map', '0:a:0?', '-threads', str(self.threads_per_job),
+            *codec_args, '-movflags', '+faststart', '-f', 'mp4', output_path
+        ]
+
+    def _build_audio_command(self, source_path: str, output_path: str, probe: Dict, codec: str, bitrate: int) -> List[str]:
+        """Build ffmpeg command line extracting audio, copied when the source already matches"""
+        settings = AUDIO_CODECS[codec]
+        if not probe['audio_codec']:
+            raise ValueError("source has no audio stream")
+
+        # Re-encoding a stream already in the target codec at or below the target bitrate only costs quality
+        if probe['audio_codec'] in settings['copy_codecs'] and 0 < probe['audio_kbps'] <= bitrate * 1.1:
+            codec_args = ['-c:a', 'copy']
+        else:
+            codec_args = ['-c:a', settings['encoder'], '-b:a', f'{bitrate}k']
+
+        return [
+            self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', source_path,
+            '-map', '0:a:0', '-vn', '-map_metadata', '0', *codec_args,
+            *(['-movflags', '+faststart'] if settings['muxer'] == 'ipod' else []),
+            '-f', settings['muxer'], output_path
+        ]
+
+    def get_stats(self) -> Dict:
+        """
+        Get transcoding statistics
+
+        Returns:
+            Dictionary containing transcoding statistics
+        """
+        with self.lock:
+            return {
+                'available': self.available,
+                'max_workers': self.max_workers,
+                'running': sum(1 for future in self.jobs.values() if not future.done()),
+                'completed': self.completed,
+                'failed': self.failed,
+                'cache_hits': self.cache_hits
+            }
@@ -0,0 +1,125 @@
+import time
+import threading
+import logging
+from typing import Any, Dict, Hashable, Optional
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    def __init__(self, max_entries: int = 1000, ttl: float = 600):
+        """
+        Initialize an in-process cache with TTL expiry and LRU eviction
+
+        Args:
+            max_entries: Maximum number of entries kept before evicting the least recently used
+            ttl: Default time to live for entries in seconds
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value or None if missing or expired
+        """
+        current_time = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if current_time >= expires_at:
+                # Expired entries are dropped lazily on access
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value in the cache
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live for this entry in seconds, defaults to the cache TTL
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+
+            # Evict least recently used entries when over capacity
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Remove a value from the cache
+
+        Args:
+            key: Cache key
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache"""
+        with self.lock:
+            self.entries.clear()
+
+    def cleanup_expired(self) -> None:
+        """
+        Remove expired entries to prevent memory buildup
+        This should be called periodically in a production environment
+        """
+        current_time = time.time()
+
+        with self.lock:
+            expired_keys = [key for key, (_, expires_at) in self.entries.items() if current_time >= expires_at]
+            for key in expired_keys:
+                del self.entries[key]
+            self.expirations += len(expired_keys)
+
+        logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary containing cache statistics
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups > 0 else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
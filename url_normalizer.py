@@ -0,0 +1,209 @@
+import re
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PLATFORM_DOMAINS = {
+    'youtube': ['youtube.com', 'youtu.be', 'youtube-nocookie.com'],
+    'tiktok': ['tiktok.com'],
+    'instagram': ['instagram.com'],
+}
+
+YOUTUBE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+YOUTUBE_PATH_PATTERN = re.compile(r'^/(?:shorts|embed|live|v|e)/([A-Za-z0-9_-]{11})')
+
+# Common TikTok URL patterns carrying the numeric video ID
+TIKTOK_ID_PATTERNS = [
+    re.compile(r'tiktok\.com.*?/video/(\d+)'),
+    re.compile(r'tiktok\.com/@[^/]+/video/(\d+)'),
+    re.compile(r'tiktok\.com/v/(\d+)'),
+    re.compile(r'/(\d{19,})'),  # TikTok video IDs are typically 19 digits
+]
+
+# TikTok short links only carry a code that redirects to the full URL
+TIKTOK_SHORT_LINK_PATTERN = re.compile(r'(?:vm|vt)\.tiktok\.com/([A-Za-z0-9]+)|tiktok\.com/t/([A-Za-z0-9]+)')
+
+INSTAGRAM_PATH_PATTERN = re.compile(r'^/(?:[^/]+/)?(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')
+
+def _get_host(url: str) -> str:
+    """Get lowercase host name without port"""
+    return (urlparse(url.strip()).hostname or '').lower()
+
+def _host_matches(host: str, domain: str) -> bool:
+    """Check if host is the domain or one of its subdomains"""
+    return host == domain or host.endswith('.' + domain)
+
+def detect_platform(url: str) -> str:
+    """
+    Determine platform from URL host
+
+    Args:
+        url: Video URL
+
+    Returns:
+        Platform name or 'unknown'
+    """
+    host = _get_host(url)
+    for platform, domains in PLATFORM_DOMAINS.items():
+        if any(_host_matches(host, domain) for domain in domains):
+            return platform
+    return 'unknown'
+
+def extract_tiktok_id(url: str) -> Optional[str]:
+    """Extract numeric TikTok video ID from URL"""
+    for pattern in TIKTOK_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+def extract_tiktok_short_code(url: str) -> Optional[str]:
+    """Extract code from TikTok short link"""
+    match = TIKTOK_SHORT_LINK_PATTERN.search(url)
+    if match:
+        return match.group(1) or match.group(2)
+    return None
+
+def extract_youtube_id(url: str) -> Optional[str]:
+    """Extract YouTube video ID from watch, short, embed and youtu.be URLs"""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or '').lower()
+
+    if _host_matches(host, 'youtu.be'):
+        video_id = parsed.path.strip('/').split('/')[0]
+        return video_id if YOUTUBE_ID_PATTERN.match(video_id) else None
+
+    video_id = parse_qs(parsed.query).get('v', [''])[0]
+    if YOUTUBE_ID_PATTERN.match(video_id):
+        return video_id
+
+    match = YOUTUBE_PATH_PATTERN.match(parsed.path)
+    if match:
+        return match.group(1)
+    return None
+
+def extract_instagram_id(url: str) -> Optional[str]:
+    """Extract Instagram post or reel shortcode from URL"""
+    match = INSTAGRAM_PATH_PATTERN.match(urlparse(url.strip()).path)
+    if match:
+        return match.group(1)
+    return None
+
+class UrlNormalizer:
+    # Failed resolutions are retried after this many seconds instead of on every lookup
+    FAILED_RESOLUTION_TTL = 60
+    # Keys of recently seen URLs, a request looks its URL up many times
+    KEY_CACHE_TTL = 60
+
+    def __init__(self, resolve_short_links: bool = True, resolve_timeout: int = 5):
+        """
+        Initialize URL normalizer
+
+        Args:
+            resolve_short_links: Resolve TikTok short links with a HEAD request
+            resolve_timeout: Timeout for short link resolution in seconds
+        """
+        self.resolve_short_links = resolve_short_links
+        self.resolve_timeout = resolve_timeout
+        # Short links point to the same video for good, so keep them for a day
+        self.short_link_cache = TTLCache(max_entries=10000, ttl=24 * 3600)
+        self.key_cache = TTLCache(max_entries=10000, ttl=self.KEY_CACHE_TTL)
+
+    def normalize(self, url: str) -> Tuple[str, Optional[str]]:
+        """
+        Map any supported URL form to its platform and video ID
+
+        Args:
+            url: Video URL
+
+        Returns:
+            Tuple of (platform, video_id), video_id is None if it cannot be determined
+        """
+        platform = detect_platform(url)
+
+        if platform == 'youtube':
+            return platform, extract_youtube_id(url)
+        elif platform == 'instagram':
+            return platform, extract_instagram_id(url)
+        elif platform == 'tiktok':
+            video_id = extract_tiktok_id(url)
+            if not video_id and extract_tiktok_short_code(url):
+                resolved_url = self.resolve_short_link(url)
+                video_id = extract_tiktok_id(resolved_url) if resolved_url else None
+            return platform, video_id
+
+        return platform, None
+
+    def cache_key(self, url: str) -> tuple:
+        """
+        Build cache key from platform and video ID or normalized URL
+
+        Args:
+            url: Video URL
+
+        Returns:
+            (platform, video_id) or ('url', normalized_url) if no ID was found
+        """
+        key = self.key_cache.get(url)
+        if key is None:
+            key = self._build_cache_key(url)
+            self.key_cache.set(url, key)
+        return key
+
+    def _build_cache_key(self, url: str) -> tuple:
+        """Build cache key, may resolve a short link over the network"""
+        platform, video_id = self.normalize(url)
+        if video_id:
+            return (platform, video_id)
+
+        # Fall back to the URL without scheme, fragment and trailing slash
+        parsed = urlparse(url.strip())
+        host = (parsed.hostname or '').lower()
+        if host.startswith('www.') or host.startswith('m.'):
+            host = host.split('.', 1)[1]
+        normalized_url = f"{host}{parsed.path.rstrip('/')}"
+        if parsed.query:
+            normalized_url += f"?{parsed.query}"
+        return ('url', normalized_url)
+
+    def resolve_short_link(self, url: str) -> Optional[str]:
+        """
+        Resolve short link to its target URL, results are cached
+
+        Args:
+            url: Short link
+
+        Returns:
+            Target URL or None if resolution failed
+        """
+        cached_url = self.short_link_cache.get(url)
+        if cached_url is not None:
+            # An empty string marks a recent failed resolution
+            return cached_url or None
+
+        if not self.resolve_short_links:
+            return None
+
+        try:
+            response = requests.head(url, allow_redirects=True, timeout=self.resolve_timeout)
+            resolved_url = response.url
+        except Exception as e:
+            logger.warning(f"Error resolving short link {url}: {str(e)}")
+            resolved_url = None
+
+        if resolved_url and resolved_url != url:
+            self.short_link_cache.set(url, resolved_url)
+            return resolved_url
+
+        self.short_link_cache.set(url, '', ttl=self.FAILED_RESOLUTION_TTL)
+        return None
+
+    def get_stats(self) -> Dict:
+        """Get short link cache statistics"""
+        return self.short_link_cache.get_stats()
@@ -1,12 +1,129 @@
 import yt_dlp
 import logging
 import re
-from typing import Dict, Optional, List
+import copy
+import time
+import functools
+import threading
+from contextlib import ExitStack
+from typing import Callable, Dict, Iterator, Optional, List
+from urllib.parse import urlparse, parse_qs
+from ttl_cache import TTLCache
+from ydl_pool import YoutubeDLPool
+from hedging import run_hedged
+from strategy_stats import StrategyStats
+from single_flight import SingleFlight
+from download_progress import ProgressTracker
+from download_scheduler import DownloadScheduler
+from storage_manager import is_partial_file
+from format_index import FormatIndex, SINGLE_FILE_PROTOCOLS
+from media_sniffer import detect_container, detect_error_page
+from url_normalizer import UrlNormalizer, detect_platform, extract_tiktok_short_code
 
 logger = logging.getLogger(__name__)
 
 class VideoDownloader:
-    def __init__(self):
+    # Direct URL cache lifetime when the URL carries no expiry, and margin before a known expiry
+    DIRECT_URL_DEFAULT_TTL = 300
+    DIRECT_URL_EXPIRY_MARGIN = 120
+    DIRECT_URL_MAX_TTL = 6 * 3600
+    
+    # Download engine settings per platform and quality, 'default' entries apply when nothing
+    # more specific is set. YouTube serves DASH/HLS fragments and throttles unchunked HTTP
+    # downloads, TikTok and Instagram mostly serve single progressive files.
+    DOWNLOAD_ENGINE_PROFILES = {
+        'default': {
+            'default': {'concurrent_fragment_downloads': 4, 'http_chunk_size': 10 * 1024 ** 2, 'buffersize': 64 * 1024},
+        },
+        'youtube': {
+            'default': {'concurrent_fragment_downloads': 8},
+            '360p': {'concurrent_fragment_downloads': 4},
+            '240p': {'concurrent_fragment_downloads': 4},
+            'worst': {'concurrent_fragment_downloads': 2},
+            'audio': {'concurrent_fragment_downloads': 2},
+        },
+        'tiktok': {
+            'default': {'concurrent_fragment_downloads': 2, 'http_chunk_size': None},
+        },
+        'instagram': {
+            'default': {'concurrent_fragment_downloads': 4, 'http_chunk_size': None},
+        },
+    }
+    
+    # yt-dlp format selector for each supported quality name
+    QUALITY_FORMATS = {
+        'worst': 'worst',
+        'best': 'best',
+        '720p': 'best[height<=720]/best',
+        '480p': 'best[height<=480]/best',
+        '360p': 'best[height<=360]/best',
+        '240p': 'best[height<=240]/best',
+        'audio': 'bestaudio'
+    }
+    
+    # Audio mode falls back to the smallest full format on sites without audio-only streams
+    AUDIO_FORMAT = 'bestaudio/worst'
+    
+    # Bytes inspected before deciding whether a transfer is media or an error page
+    EARLY_VALIDATION_BYTES = 4096
+    MIN_VIDEO_BYTES = 1024
+    
+    # Thresholds for adjusting fragment concurrency to the expected download size
+    SHORT_VIDEO_SECONDS = 60
+    SMALL_DOWNLOAD_BYTES = 16 * 1024 ** 2
+    LONG_VIDEO_SECONDS = 20 * 60
+    LARGE_DOWNLOAD_BYTES = 256 * 1024 ** 2
+    MAX_CONCURRENT_FRAGMENTS = 16
+    
+    def __init__(self, cache_ttl: int = 600, cache_size: int = 1000,
+                 hedge_delay: Optional[float] = None, max_parallel_strategies: int = 2,
+                 download_engine: Optional[Dict] = None, max_concurrent_jobs: int = 6,
+                 platform_concurrency: Optional[Dict[str, int]] = None):
+        # Maps URL variants and short links to one (platform, video_id) key
+        self.url_normalizer = UrlNormalizer()
+        
+        # Raw yt-dlp metadata shared by info, direct URL and download requests
+        self.info_cache = TTLCache(max_entries=cache_size, ttl=cache_ttl)
+        
+        # Format tables of cached metadata indexed for quality selection
+        self.format_indexes = TTLCache(max_entries=cache_size, ttl=cache_ttl)
+        
+        # Resolved direct URLs, each entry expires with its signed URL
+        self.direct_url_cache = TTLCache(max_entries=cache_size, ttl=self.DIRECT_URL_DEFAULT_TTL)
+        
+        # Hedged extraction: start the next strategy after hedge_delay seconds
+        # or on failure, None runs strategies strictly in order
+        self.hedge_delay = hedge_delay
+        self.max_parallel_strategies = max_parallel_strategies
+        
+        # Concurrent identical requests share one in-flight extraction or download
+        self.single_flight = SingleFlight()
+        
+        # Bounds extractions and downloads globally and per platform, info requests go first
+        self.scheduler = DownloadScheduler(
+            max_concurrent=max_concurrent_jobs,
+            platform_limits=platform_concurrency or {'youtube': 4, 'tiktok': 3, 'instagram': 2}
+        )
+        
+        # Rolling success/latency statistics used to order strategies per platform
+        self.strategy_stats = StrategyStats()
+        
+        # Progress of running downloads, hooks find their download through thread-local context
+        self.progress_tracker = ProgressTracker()
+        self._progress_context = threading.local()
+        
+        # Reusable YoutubeDL instances keyed by option profile
+        self.ydl_pool = YoutubeDLPool(progress_hook=self._on_progress)
+        
+        # Partial files resumed by a later strategy and stale partials removed
+        self.partial_stats = {'resume_attempts': 0, 'cleaned_up': 0}
+        
+        # Per platform/quality overrides of the download engine settings
+        self.download_engine_profiles = copy.deepcopy(self.DOWNLOAD_ENGINE_PROFILES)
+        for platform, qualities in (download_engine or {}).items():
+            for quality, settings in qualities.items():
+                self.download_engine_profiles.setdefault(platform, {}).setdefault(quality, {}).update(settings)
+        
         # Common headers to avoid 403 errors - updated for better compatibility
         common_headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
@@ -54,6 +171,7 @@ class VideoDownloader:
             'socket_timeout': 30,
             'retries': 3,
             'fragment_retries': 3,
+            'continuedl': True,  # Resume .part files left by an earlier attempt at the same format
             'extract_flat': False,
             'writesubtitles': False,
             'writeautomaticsub': False,
@@ -61,70 +179,108 @@ class VideoDownloader:
 
     def get_video_info(self, url: str) -> Optional[Dict]:
         """Extract video metadata without downloading"""
-        try:
-            # Special handling for TikTok URLs
-            opts = self.ydl_opts_info.copy()
-            if 'tiktok.com' in url.lower():
-                opts.update({
-                    'extractor_args': {
-                        'tiktok': {
-                            'webpage_download_timeout': 60,
-                            'api_hostname': 'api.tiktokv.com'
-                        }
-                    }
-                })
-            
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    return None
-                
-                # Extract relevant information
-                video_info = {
-                    'title': info.get('title', 'Unknown Title'),
-                    'description': info.get('description', ''),
-                    'duration': info.get('duration', 0),
-                    'duration_string': self._format_duration(info.get('duration', 0)),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'upload_date': info.get('upload_date', ''),
-                    'view_count': info.get('view_count', 0),
-                    'like_count': info.get('like_count', 0),
-                    'webpage_url': info.get('webpage_url', url),
-                    'formats': self._extract_formats(info.get('formats', [])),
-                    'video_id': info.get('id', ''),
-                    'platform': self._get_platform_from_extractor(info.get('extractor', ''))
-                }
-                
-                return video_info
-                
-        except Exception as e:
-            logger.warning(f"Primary extraction failed for {url}: {str(e)}")
-            # Try fallback method
-            return self._try_fallback_extraction(url)
+        cache_key = self._cache_key(url)
+        return self.single_flight.do(('info', cache_key), lambda: self._get_video_info(url, cache_key))
     
-    def _try_fallback_extraction(self, url: str) -> Optional[Dict]:
-        """Try multiple fallback methods for video extraction"""
-        fallback_methods = [
+    def _get_video_info(self, url: str, cache_key: tuple) -> Optional[Dict]:
+        """Extract video metadata, answering from the metadata cache when possible"""
+        cached_info = self.info_cache.get(cache_key)
+        if cached_info:
+            return self._format_video_info(cached_info, url)
+        
+        extraction_methods = [
+            self._extract_with_default_opts,
             self._extract_with_updated_headers,
             self._extract_with_minimal_opts,
             self._extract_with_no_cookies
         ]
         
-        for i, method in enumerate(fallback_methods):
-            try:
-                logger.info(f"Trying fallback method {i+1} for {url}")
-                result = method(url)
-                if result:
-                    logger.info(f"Successfully extracted info using fallback method {i+1}")
-                    return result
-            except Exception as e:
-                logger.warning(f"Fallback method {i+1} failed for {url}: {str(e)}")
-                continue
+        return self._run_info_strategies('extraction', url, extraction_methods, (url,))
+    
+    def _run_info_strategies(self, label: str, url: str, methods: List, args: tuple) -> Optional[Dict]:
+        """Run hedged info strategies in an info scheduler slot held until every attempt has finished"""
+        slot = ExitStack()
+        slot.enter_context(self.scheduler.slot(self._get_platform_from_url(url), DownloadScheduler.PRIORITY_INFO))
+        try:
+            # Hedged losers keep calling upstream after the winner returns, the slot covers them too
+            return self._run_strategies(label, url, methods, args, hedged=True, on_finished=slot.close)
+        except BaseException:
+            slot.close()
+            raise
+    
+    def _run_strategies(self, label: str, url: str, methods: List, args: tuple, hedged: bool = False,
+                        on_finished: Optional[Callable[[], None]] = None) -> Optional[Dict]:
+        """Run strategies in adaptive order, or race them when hedging is enabled, then call
+        on_finished once no attempt is running, for hedged runs possibly after returning"""
+        platform = self._get_platform_from_url(url)
+        methods = self.strategy_stats.order(platform, label, methods)
+        outcomes = []
         
-        logger.error(f"All fallback methods failed for {url}")
-        return None
+        def finish():
+            self.strategy_stats.record_run(platform, label, outcomes)
+            if on_finished:
+                on_finished()
+        
+        if hedged and self.hedge_delay is not None:
+            strategies = [(method.__name__, functools.partial(self._timed_strategy, label, method, args, outcomes))
+                          for method in methods]
+            result = run_hedged(strategies, self.hedge_delay, self.max_parallel_strategies, on_finished=finish)
+            if not result:
+                logger.error(f"All {label} methods failed for {url}")
+            return result
+        
+        try:
+            for method in methods:
+                try:
+                    logger.info(f"Trying {label} method {method.__name__} for {url}")
+                    result = self._timed_strategy(label, method, args, outcomes)
+                    if result:
+                        logger.info(f"Successful {label} using {method.__name__}")
+                        return result
+                except Exception as e:
+                    logger.warning(f"{label.capitalize()} method {method.__name__} failed for {url}: {str(e)}")
+                    continue
+            
+            logger.error(f"All {label} methods failed for {url}")
+            return None
+        finally:
+            finish()
+    
+    def _timed_strategy(self, label: str, method, args: tuple, outcomes: List) -> Optional[Dict]:
+        """Run a single strategy and append its outcome and latency to outcomes"""
+        download_id = getattr(self._progress_context, 'download_id', None)
+        if download_id and label in ('download', 'audio'):
+            self.progress_tracker.set_method(download_id, method.__name__)
+            # Each attempt writes its own partial file, validate it again
+            self._progress_context.validated_files = set()
+            self._log_resumable_partials(args[2], download_id)
+        
+        start_time = time.time()
+        result = None
+        try:
+            result = method(*args)
+            return result
+        finally:
+            outcomes.append((method.__name__, bool(result), time.time() - start_time))
+    
+    def _extract_with_default_opts(self, url: str) -> Optional[Dict]:
+        """Try extraction with the default info options"""
+        # Special handling for TikTok URLs
+        opts = self.ydl_opts_info.copy()
+        if 'tiktok.com' in url.lower():
+            opts.update({
+                'extractor_args': {
+                    'tiktok': {
+                        'webpage_download_timeout': 60,
+                        'api_hostname': 'api.tiktokv.com'
+                    }
+                }
+            })
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            self._remember_info(url, info)
+            return self._format_video_info(info, url)
     
     def _extract_with_updated_headers(self, url: str) -> Optional[Dict]:
         """Try extraction with updated headers for better compatibility"""
@@ -146,8 +302,10 @@ class VideoDownloader:
             }
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            return self._format_video_info(ydl.extract_info(url, download=False), url)
+        with self.ydl_pool.acquire(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            self._remember_info(url, info)
+            return self._format_video_info(info, url)
     
     def _extract_with_minimal_opts(self, url: str) -> Optional[Dict]:
         """Try extraction with minimal options"""
@@ -158,8 +316,10 @@ class VideoDownloader:
             'no_check_certificate': True,
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            return self._format_video_info(ydl.extract_info(url, download=False), url)
+        with self.ydl_pool.acquire(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            self._remember_info(url, info)
+            return self._format_video_info(info, url)
     
     def _extract_with_no_cookies(self, url: str) -> Optional[Dict]:
         """Try extraction without cookies or authentication"""
@@ -172,8 +332,10 @@ class VideoDownloader:
             'no_cookies': True,
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            return self._format_video_info(ydl.extract_info(url, download=False), url)
+        with self.ydl_pool.acquire(opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            self._remember_info(url, info)
+            return self._format_video_info(info, url)
     
     def _format_video_info(self, info, url: str) -> Optional[Dict]:
         """Format extracted info into standard video info dict"""
@@ -203,176 +365,258 @@ class VideoDownloader:
             'platform': self._get_platform_from_extractor(info.get('extractor', ''))
         }
 
-    def download_video(self, url: str, quality: str = 'best', output_path: str = 'downloads') -> Optional[Dict]:
+    def download_video(self, url: str, quality: str = 'best', output_path: str = 'downloads',
+                       download_id: Optional[str] = None) -> Optional[Dict]:
         """Download video directly using yt-dlp"""
+        return self.single_flight.do(('download', self._cache_key(url), quality, output_path),
+                                     lambda: self._download_video(url, quality, output_path, download_id))
+    
+    def _download_video(self, url: str, quality: str, output_path: str, download_id: Optional[str]) -> Optional[Dict]:
+        """Download video through the download strategy chain"""
+        if 'tiktok.com' in url.lower():
+            # TikTok specific strategies replace the generic minimal options
+            download_methods = [
+                self._download_with_default_opts,
+                self._try_tiktok_mobile_extraction,
+                self._try_tiktok_api_extraction,
+                self._try_tiktok_generic_extraction,
+                self._download_with_updated_headers,
+                self._download_with_basic_opts
+            ]
+        else:
+            download_methods = [
+                self._download_with_default_opts,
+                self._download_with_minimal_opts,
+                self._download_with_updated_headers,
+                self._download_with_basic_opts
+            ]
+        
+        return self._run_download('download', url, download_methods, quality, output_path, download_id,
+                                  self._get_download_priority(url))
+    
+    def download_audio(self, url: str, output_path: str = 'downloads',
+                       download_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Download only the audio stream of a video
+        
+        Audio streams are a fraction of the video size, so they skip the
+        long video strategy chain and queue ahead of regular downloads.
+        Unlike download_video, calls are not coalesced: each caller owns the
+        file it gets and may convert or delete it.
+        
+        Args:
+            url: Video URL
+            output_path: Directory for the downloaded file
+            download_id: ID to name the file by, generated if not given
+            
+        Returns:
+            Download info dictionary or None if the download failed
+        """
+        download_methods = [
+            self._download_audio_with_default_opts,
+            self._download_audio_with_basic_opts
+        ]
+        
+        return self._run_download('audio', url, download_methods, 'audio', output_path, download_id,
+                                  DownloadScheduler.PRIORITY_SMALL_DOWNLOAD)
+    
+    def _run_download(self, label: str, url: str, download_methods: List, quality: str, output_path: str,
+                      download_id: Optional[str], priority: int) -> Optional[Dict]:
+        """Run download strategies in a scheduler slot, tracking progress and cleaning up partial files"""
         import os
         import uuid
         
+        # Create downloads directory if it doesn't exist
+        os.makedirs(output_path, exist_ok=True)
+        
+        # Generate unique filename unless the caller already assigned an ID
+        download_id = download_id or str(uuid.uuid4())
+        
+        result = None
+        self.progress_tracker.start(download_id)
+        self._progress_context.download_id = download_id
         try:
-            # Create downloads directory if it doesn't exist
-            os.makedirs(output_path, exist_ok=True)
-            
-            # Generate unique filename
-            download_id = str(uuid.uuid4())
-            
-            # Adjust format based on quality preference
-            format_selector = self._get_format_selector(quality)
-            
-            # Special handling for TikTok URLs
-            opts = self.ydl_opts_download.copy()
-            opts.update({
-                'format': format_selector,
-                'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
-            })
-            
-            if 'tiktok.com' in url.lower():
-                opts.update({
-                    'extractor_args': {
-                        'tiktok': {
-                            'webpage_download_timeout': 60,
-                            'api_hostname': 'api.tiktokv.com'
-                        }
-                    }
-                })
-            
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                # First get info to check if video exists
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    return None
-                
-                # Now download the video
-                ydl.download([url])
-                
-                # Find the downloaded file
-                file_extension = info.get('ext', 'mp4')
-                downloaded_file = os.path.join(output_path, f'{download_id}.{file_extension}')
-                
-                if not os.path.exists(downloaded_file):
-                    # Try to find file with different extension
-                    for ext in ['mp4', 'webm', 'mkv', 'avi']:
-                        test_file = os.path.join(output_path, f'{download_id}.{ext}')
-                        if os.path.exists(test_file):
-                            downloaded_file = test_file
-                            file_extension = ext
-                            break
-                    else:
-                        logger.error(f"Downloaded file not found: {downloaded_file}")
-                        return None
-                
-                # Get file size
-                file_size = os.path.getsize(downloaded_file)
-                
-                download_info = {
-                    'title': info.get('title', 'Unknown Title'),
-                    'download_id': download_id,
-                    'filename': os.path.basename(downloaded_file),
-                    'file_path': downloaded_file,
-                    'file_extension': file_extension,
-                    'file_size': file_size,
-                    'quality': quality,
-                    'format_id': info.get('format_id', ''),
-                    'resolution': info.get('resolution', 'Unknown'),
-                    'fps': info.get('fps', 0),
-                    'duration': info.get('duration', 0),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'platform': self._get_platform_from_extractor(info.get('extractor', ''))
-                }
-                
-                return download_info
-                
-        except Exception as e:
-            logger.warning(f"Primary download failed for {url}: {str(e)}")
-            # Try fallback download method
-            return self._try_fallback_download(url, quality, output_path, download_id)
+            with self.scheduler.slot(self._get_platform_from_url(url), priority):
+                # Attempts share partial files per format, so they always run in order
+                result = self._run_strategies(label, url, download_methods, (url, quality, output_path, download_id))
+        finally:
+            self._progress_context.download_id = None
+            self._remove_partial_files(output_path, download_id)
+            # Also reached when an exception escapes, so the record always gets a final status
+            self.progress_tracker.finish(download_id, 'done' if result else 'failed')
+        
+        return result
     
-    def _try_fallback_download(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
-        """Try fallback download methods when primary method fails"""
+    def _on_progress(self, hook_data: Dict) -> None:
+        """yt-dlp progress hook, forwards progress of the current thread's download"""
+        download_id = getattr(self._progress_context, 'download_id', None)
+        if not download_id and hook_data.get('filename'):
+            # Concurrent fragment downloads report from yt-dlp worker threads, output files are named by download ID
+            import os
+            candidate_id = os.path.basename(hook_data['filename']).split('.')[0]
+            if self.progress_tracker.get(candidate_id):
+                download_id = candidate_id
+        if download_id:
+            self.progress_tracker.update(download_id, hook_data)
+            if hook_data.get('status') == 'downloading':
+                self._validate_partial_download(hook_data)
+    
+    def _validate_partial_download(self, hook_data: Dict) -> None:
+        """Abort a transfer as soon as its first bytes show it is not media"""
         import os
         
-        fallback_methods = [
-            self._download_with_minimal_opts,
-            self._download_with_updated_headers,
-            self._download_with_basic_opts
-        ]
+        tmpfilename = hook_data.get('tmpfilename')
+        validated = self._progress_context.__dict__.setdefault('validated_files', set())
+        if not tmpfilename or tmpfilename in validated:
+            return
         
-        for i, method in enumerate(fallback_methods):
-            try:
-                logger.info(f"Trying fallback download method {i+1} for {url}")
-                result = method(url, quality, output_path, download_id)
-                if result:
-                    logger.info(f"Successfully downloaded using fallback method {i+1}")
-                    return result
-            except Exception as e:
-                logger.warning(f"Fallback download method {i+1} failed for {url}: {str(e)}")
-                continue
+        # Content-Length is known before any body bytes arrive
+        total_bytes = hook_data.get('total_bytes')
+        if total_bytes is not None and total_bytes < self.MIN_VIDEO_BYTES:
+            self._abort_download(tmpfilename, f"response is only {total_bytes} bytes")
         
-        logger.error(f"All fallback download methods failed for {url}")
-        return None
+        expected_bytes = (hook_data.get('info_dict') or {}).get('filesize')
+        if total_bytes and expected_bytes and total_bytes < expected_bytes / 4:
+            self._abort_download(tmpfilename, f"response is {total_bytes} bytes, expected about {expected_bytes}")
+        
+        needed_bytes = min(self.EARLY_VALIDATION_BYTES, total_bytes or self.EARLY_VALIDATION_BYTES)
+        if (hook_data.get('downloaded_bytes') or 0) < needed_bytes:
+            return
+        
+        try:
+            with open(tmpfilename, 'rb') as f:
+                head = f.read(self.EARLY_VALIDATION_BYTES)
+        except OSError:
+            return
+        
+        # Data may still be buffered by the downloader, check again on the next hook
+        if len(head) < needed_bytes:
+            return
+        
+        validated.add(tmpfilename)
+        reason = detect_error_page(head)
+        if reason:
+            self._abort_download(tmpfilename, f"received {reason} instead of media")
+        
+        logger.debug(f"Early validation passed for {os.path.basename(tmpfilename)}: {detect_container(head) or 'unknown container'}")
     
-    def _download_with_minimal_opts(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
-        """Try download with minimal options"""
+    def _abort_download(self, tmpfilename: str, reason: str) -> None:
+        """Delete partial file and stop the transfer, the strategy chain moves on to the next method"""
         import os
         
-        # Special handling for TikTok URLs with enhanced extraction
+        logger.warning(f"Aborting download {os.path.basename(tmpfilename)}: {reason}")
+        try:
+            os.remove(tmpfilename)
+        except OSError:
+            pass
+        raise yt_dlp.utils.DownloadError(f"Early validation failed: {reason}")
+    
+    def _download_with_default_opts(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
+        """Try download with the default download options"""
+        import os
+        
+        # Adjust format based on quality preference
+        format_selector = self._get_format_selector(quality)
+        
+        # Special handling for TikTok URLs
+        opts = self.ydl_opts_download.copy()
+        opts.update({
+            'format': format_selector,
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
+        })
+        
         if 'tiktok.com' in url.lower():
-            # Try different TikTok extraction approaches
-            tiktok_methods = [
-                self._try_tiktok_mobile_extraction,
-                self._try_tiktok_api_extraction,
-                self._try_tiktok_generic_extraction
-            ]
+            opts.update({
+                'extractor_args': {
+                    'tiktok': {
+                        'webpage_download_timeout': 60,
+                        'api_hostname': 'api.tiktokv.com'
+                    }
+                }
+            })
+        
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            cached_info = self.info_cache.get(self._cache_key(url))
+            if cached_info:
+                # Reuse cached metadata, only format selection and download run
+                info = ydl.process_ie_result(copy.deepcopy(cached_info), download=True)
+            else:
+                # Extract and download in a single pass
+                info = ydl.extract_info(url, download=True)
+                
+                if not info:
+                    return None
+                
+                self._remember_info(url, info)
             
-            for method in tiktok_methods:
-                try:
-                    result = method(url, output_path, download_id)
-                    if result and self._validate_downloaded_file(result['file_path']):
-                        return result
-                    elif result:
-                        # Clean up invalid file
-                        try:
-                            os.remove(result['file_path'])
-                        except:
-                            pass
-                except Exception as e:
-                    logger.warning(f"TikTok method {method.__name__} failed: {str(e)}")
-                    continue
-        else:
-            # Non-TikTok URLs
-            opts = {
-                'quiet': True,
-                'ignoreerrors': True,
-                'no_check_certificate': True,
-                'format': 'best[height<=720]/best',
-                'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+            # Find the downloaded file
+            self._finalize_download(info, output_path, download_id)
+            file_extension = info.get('ext', 'mp4')
+            downloaded_file = os.path.join(output_path, f'{download_id}.{file_extension}')
+            
+            if not os.path.exists(downloaded_file):
+                # Try to find file with different extension
+                for ext in ['mp4', 'webm', 'mkv', 'avi']:
+                    test_file = os.path.join(output_path, f'{download_id}.{ext}')
+                    if os.path.exists(test_file):
+                        downloaded_file = test_file
+                        file_extension = ext
+                        break
+                else:
+                    logger.error(f"Downloaded file not found: {downloaded_file}")
+                    return None
+            
+            # Get file size
+            file_size = os.path.getsize(downloaded_file)
+            
+            download_info = {
+                'title': info.get('title', 'Unknown Title'),
+                'download_id': download_id,
+                'filename': os.path.basename(downloaded_file),
+                'file_path': downloaded_file,
+                'file_extension': file_extension,
+                'file_size': file_size,
+                'quality': quality,
+                'format_id': info.get('format_id', ''),
+                'resolution': info.get('resolution', 'Unknown'),
+                'fps': info.get('fps', 0),
+                'duration': info.get('duration', 0),
+                'thumbnail': info.get('thumbnail', ''),
+                'platform': self._get_platform_from_extractor(info.get('extractor', ''))
             }
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                if info:
-                    ydl.download([url])
-                    result = self._create_download_info(info, output_path, download_id)
-                    if result and self._validate_downloaded_file(result['file_path']):
-                        return result
-                    elif result:
-                        try:
-                            os.remove(result['file_path'])
-                        except:
-                            pass
+            return download_info
+    
+    def _download_with_minimal_opts(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
+        """Try download with minimal options"""
+        opts = {
+            'quiet': True,
+            'ignoreerrors': True,
+            'no_check_certificate': True,
+            'format': 'best[height<=720]/best',
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
+        }
         
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # Extract and download in a single pass
+            info = ydl.extract_info(url, download=True)
+            if info:
+                self._remember_info(url, info)
+                return self._create_validated_download_info(info, output_path, download_id)
         return None
     
-    def _try_tiktok_mobile_extraction(self, url: str, output_path: str, download_id: str) -> Optional[Dict]:
+    def _try_tiktok_mobile_extraction(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
         """Try TikTok extraction with mobile user agent"""
-        import os
-        
         opts = {
             'quiet': True,
             'ignoreerrors': True,
             'no_check_certificate': True,
             'format': 'best',
-            'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1',
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -384,23 +628,24 @@ class VideoDownloader:
             }
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # Extract and download in a single pass
+            info = ydl.extract_info(url, download=True)
             if info:
-                ydl.download([url])
-                return self._create_download_info(info, output_path, download_id)
+                self._remember_info(url, info)
+                return self._create_validated_download_info(info, output_path, download_id)
         return None
     
-    def _try_tiktok_api_extraction(self, url: str, output_path: str, download_id: str) -> Optional[Dict]:
+    def _try_tiktok_api_extraction(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
         """Try TikTok extraction with API configuration"""
-        import os
-        
         opts = {
             'quiet': True,
             'ignoreerrors': True,
             'no_check_certificate': True,
             'format': 'best',
-            'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
             'http_headers': {
                 'User-Agent': 'TikTok 26.2.0 rv:262018 (iPhone; iOS 14.4.2; en_US) Cronet',
                 'Accept': '*/*',
@@ -414,33 +659,85 @@ class VideoDownloader:
             }
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # Extract and download in a single pass
+            info = ydl.extract_info(url, download=True)
             if info:
-                ydl.download([url])
-                return self._create_download_info(info, output_path, download_id)
+                self._remember_info(url, info)
+                return self._create_validated_download_info(info, output_path, download_id)
         return None
     
-    def _try_tiktok_generic_extraction(self, url: str, output_path: str, download_id: str) -> Optional[Dict]:
+    def _try_tiktok_generic_extraction(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
         """Try TikTok extraction with generic approach"""
-        import os
-        
         opts = {
             'quiet': True,
             'ignoreerrors': True,
             'format': 'worst/best',  # Sometimes lower quality works better
-            'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
             'socket_timeout': 60,
             'retries': 1
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # Extract and download in a single pass
+            info = ydl.extract_info(url, download=True)
+            if info:
+                self._remember_info(url, info)
+                return self._create_validated_download_info(info, output_path, download_id)
+        return None
+    
+    def _download_audio_with_default_opts(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
+        """Download the best audio-only stream, reusing cached metadata"""
+        opts = self.ydl_opts_download.copy()
+        opts.update({
+            'format': self.AUDIO_FORMAT,
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
+        })
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            cached_info = self.info_cache.get(self._cache_key(url))
+            if cached_info:
+                info = ydl.process_ie_result(copy.deepcopy(cached_info), download=True)
+            else:
+                info = ydl.extract_info(url, download=True)
+                self._remember_info(url, info)
+            
             if info:
-                ydl.download([url])
-                return self._create_download_info(info, output_path, download_id)
+                return self._create_audio_download_info(info, output_path, download_id)
         return None
     
+    def _download_audio_with_basic_opts(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
+        """Download the best audio-only stream with basic options"""
+        opts = {
+            'quiet': True,
+            'format': self.AUDIO_FORMAT,
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
+        }
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            if info:
+                self._remember_info(url, info)
+                return self._create_audio_download_info(info, output_path, download_id)
+        return None
+    
+    def _create_audio_download_info(self, info, output_path: str, download_id: str) -> Optional[Dict]:
+        """Create download info dict for an audio download, including the audio codec"""
+        result = self._create_validated_download_info(info, output_path, download_id)
+        if result:
+            result.update({
+                'quality': 'audio',
+                'acodec': info.get('acodec'),
+                'abr': info.get('abr') or 0
+            })
+        return result
+    
     def _validate_downloaded_file(self, file_path: str) -> bool:
         """Validate that downloaded file is actually a video file and not HTML"""
         import os
@@ -450,40 +747,18 @@ class VideoDownloader:
         
         # Check file size (HTML error pages are usually small)
         file_size = os.path.getsize(file_path)
-        if file_size < 1024:  # Less than 1KB is likely not a video
+        if file_size < self.MIN_VIDEO_BYTES:  # Less than 1KB is likely not a video
             return False
         
-        # Check file content to ensure it's not HTML
+        # Check file content to ensure it's not an error page, unknown binary formats are accepted
         try:
             with open(file_path, 'rb') as f:
-                first_bytes = f.read(100).lower()
-                # Check for HTML indicators
-                html_indicators = [b'<html', b'<!doctype', b'<head>', b'<body>', b'<title>']
-                if any(indicator in first_bytes for indicator in html_indicators):
-                    return False
-                
-                # Check for common video file signatures
-                video_signatures = [
-                    b'\x00\x00\x00\x18ftypmp4',  # MP4
-                    b'\x00\x00\x00\x1cftyp',     # MP4 variant
-                    b'\x1a\x45\xdf\xa3',         # WebM/MKV
-                    b'RIFF',                       # AVI
-                ]
-                
-                # If it has video signatures, it's likely a video
-                if any(sig in first_bytes for sig in video_signatures):
-                    return True
-                
-                # For other cases, if it's not HTML and > 1KB, assume it's valid
-                return True
-                
+                return detect_error_page(f.read(self.EARLY_VALIDATION_BYTES)) is None
         except Exception:
             return False
     
     def _download_with_updated_headers(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
         """Try download with updated headers"""
-        import os
-        
         # Special TikTok handling
         if 'tiktok.com' in url.lower():
             opts = {
@@ -491,7 +766,7 @@ class VideoDownloader:
                 'ignoreerrors': True,
                 'no_check_certificate': True,
                 'format': 'best',
-                'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+                'outtmpl': self._partial_outtmpl(output_path, download_id),
                 'http_headers': {
                     'User-Agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
                     'Accept': '*/*',
@@ -510,7 +785,7 @@ class VideoDownloader:
                 'ignoreerrors': True,
                 'no_check_certificate': True,
                 'format': 'best[height<=720]/best',
-                'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+                'outtmpl': self._partial_outtmpl(output_path, download_id),
                 'http_headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
                     'Accept': '*/*',
@@ -518,48 +793,176 @@ class VideoDownloader:
                 }
             }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # Extract and download in a single pass
+            info = ydl.extract_info(url, download=True)
             if info:
-                ydl.download([url])
-                result = self._create_download_info(info, output_path, download_id)
-                # Validate the downloaded file
-                if result and self._validate_downloaded_file(result['file_path']):
-                    return result
-                else:
-                    # Clean up invalid file
-                    if result:
-                        try:
-                            os.remove(result['file_path'])
-                        except:
-                            pass
+                self._remember_info(url, info)
+                return self._create_validated_download_info(info, output_path, download_id)
         return None
     
     def _download_with_basic_opts(self, url: str, quality: str, output_path: str, download_id: str) -> Optional[Dict]:
         """Try download with basic options"""
-        import os
-        
         opts = {
             'quiet': True,
             'format': 'worst/best',
-            'outtmpl': os.path.join(output_path, f'{download_id}.%(ext)s'),
+            'outtmpl': self._partial_outtmpl(output_path, download_id),
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        opts.update(self._get_download_engine_opts(url, quality))
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # Extract and download in a single pass
+            info = ydl.extract_info(url, download=True)
             if info:
-                ydl.download([url])
-                result = self._create_download_info(info, output_path, download_id)
-                # Validate the downloaded file
-                if result and self._validate_downloaded_file(result['file_path']):
-                    return result
-                else:
-                    # Clean up invalid file
-                    if result:
-                        try:
-                            os.remove(result['file_path'])
-                        except:
-                            pass
+                self._remember_info(url, info)
+                return self._create_validated_download_info(info, output_path, download_id)
+        return None
+    
+    def _get_download_engine_opts(self, url: str, quality: str) -> Dict:
+        """Get fragment concurrency, chunking and buffer options for a download"""
+        profiles = self.download_engine_profiles
+        platform = self._get_platform_from_url(url)
+        
+        settings = {}
+        for table in (profiles.get('default', {}), profiles.get(platform, {})):
+            settings.update(table.get('default', {}))
+            settings.update(table.get(quality, {}))
+        
+        # Size the engine from cached metadata when the video was seen before, the
+        # estimate covers the whole video and does not apply to audio streams
+        download_size = self._estimate_download_size(url) if quality != 'audio' else None
+        concurrency = settings.get('concurrent_fragment_downloads', 1)
+        if download_size == 'small':
+            # Few fragments, extra threads and chunk requests only add overhead
+            settings['concurrent_fragment_downloads'] = min(concurrency, 2)
+            settings['http_chunk_size'] = None
+        elif download_size == 'large':
+            settings['concurrent_fragment_downloads'] = min(concurrency * 2, self.MAX_CONCURRENT_FRAGMENTS)
+        
+        return {key: value for key, value in settings.items() if value is not None}
+    
+    def _estimate_download_size(self, url: str) -> Optional[str]:
+        """Classify download as 'small' or 'large' from cached metadata, None if unknown"""
+        cached_info = self.info_cache.get(self._cache_key(url))
+        if not cached_info:
+            return None
+        
+        duration = cached_info.get('duration') or 0
+        estimated_size = cached_info.get('filesize') or cached_info.get('filesize_approx') or 0
+        if not estimated_size and duration and cached_info.get('tbr'):
+            estimated_size = duration * cached_info['tbr'] * 1000 / 8
+        
+        if (duration and duration <= self.SHORT_VIDEO_SECONDS) or (estimated_size and estimated_size <= self.SMALL_DOWNLOAD_BYTES):
+            return 'small'
+        if duration >= self.LONG_VIDEO_SECONDS or estimated_size >= self.LARGE_DOWNLOAD_BYTES:
+            return 'large'
+        return None
+    
+    def _get_download_priority(self, url: str) -> int:
+        """Get scheduler priority, small downloads run ahead of large ones"""
+        download_size = self._estimate_download_size(url)
+        if download_size == 'small':
+            return DownloadScheduler.PRIORITY_SMALL_DOWNLOAD
+        if download_size == 'large':
+            return DownloadScheduler.PRIORITY_LARGE_DOWNLOAD
+        return DownloadScheduler.PRIORITY_DOWNLOAD
+    
+    def _partial_outtmpl(self, output_path: str, download_id: str) -> str:
+        """Output template keyed by format, so only an attempt at the same format resumes a .part file"""
+        import os
+        return os.path.join(output_path, f'{download_id}.f%(format_id)s.%(ext)s')
+    
+    def _finalize_download(self, info, output_path: str, download_id: str) -> Optional[str]:
+        """Rename the completed per-format file to <download_id>.<ext>"""
+        import os
+        import glob
+        
+        file_path = info.get('filepath') or ((info.get('requested_downloads') or [{}])[0]).get('filepath')
+        if not file_path or not os.path.exists(file_path):
+            candidates = [
+                path for path in glob.glob(os.path.join(glob.escape(output_path), glob.escape(download_id) + '.f*.*'))
+                if not path.endswith(('.part', '.ytdl')) and '.part-Frag' not in path
+            ]
+            file_path = candidates[0] if candidates else None
+        
+        if not file_path:
+            return None
+        
+        final_path = os.path.join(output_path, download_id + os.path.splitext(file_path)[1])
+        os.replace(file_path, final_path)
+        return final_path
+    
+    def _log_resumable_partials(self, output_path: str, download_id: str) -> None:
+        """Log partial files a new attempt can resume if it picks the same format"""
+        import os
+        import glob
+        
+        partials = glob.glob(os.path.join(glob.escape(output_path), glob.escape(download_id) + '.f*.part'))
+        if partials:
+            self.partial_stats['resume_attempts'] += 1
+            resumable_bytes = sum(os.path.getsize(path) for path in partials if os.path.exists(path))
+            logger.info(f"Download {download_id} has {len(partials)} partial files ({resumable_bytes} bytes) to resume")
+    
+    def _remove_partial_files(self, output_path: str, download_id: str) -> None:
+        """Delete partial and per-format files left once the strategy chain has finished"""
+        import os
+        import glob
+        
+        for path in glob.glob(os.path.join(glob.escape(output_path), glob.escape(download_id) + '.f*.*')):
+            try:
+                os.remove(path)
+                self.partial_stats['cleaned_up'] += 1
+            except OSError as e:
+                logger.warning(f"Error removing partial file {path}: {str(e)}")
+    
+    def cleanup_partial_downloads(self, output_path: str = 'downloads', max_age: int = 3600) -> None:
+        """
+        Remove orphaned partial files, e.g. left by a crashed worker
+        This should be called periodically in a production environment
+        """
+        import os
+        
+        if not os.path.isdir(output_path):
+            return
+        
+        current_time = time.time()
+        removed = 0
+        for entry in os.scandir(output_path):
+            if not entry.is_file() or not is_partial_file(entry.name):
+                continue
+            
+            # Skip downloads still in progress
+            progress = self.progress_tracker.get(entry.name.split('.')[0])
+            if progress and progress['status'] not in ('done', 'failed'):
+                continue
+            
+            if current_time - entry.stat().st_mtime > max_age:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Error removing orphaned partial file {entry.path}: {str(e)}")
+        
+        self.partial_stats['cleaned_up'] += removed
+        logger.debug(f"Cleaned up {removed} orphaned partial files")
+    
+    def _create_validated_download_info(self, info, output_path: str, download_id: str) -> Optional[Dict]:
+        """Create download info dict, removing the file if it is not a valid video"""
+        import os
+        
+        result = self._create_download_info(info, output_path, download_id)
+        if result and self._validate_downloaded_file(result['file_path']):
+            return result
+        
+        # Clean up invalid file
+        if result:
+            try:
+                os.remove(result['file_path'])
+            except:
+                pass
         return None
     
     def _create_download_info(self, info, output_path: str, download_id: str) -> Optional[Dict]:
@@ -567,12 +970,13 @@ class VideoDownloader:
         import os
         
         # Find the downloaded file
+        self._finalize_download(info, output_path, download_id)
         file_extension = info.get('ext', 'mp4')
         downloaded_file = os.path.join(output_path, f'{download_id}.{file_extension}')
         
         if not os.path.exists(downloaded_file):
             # Try to find file with different extension
-            for ext in ['mp4', 'webm', 'mkv', 'avi']:
+            for ext in ['mp4', 'webm', 'mkv', 'avi', 'm4a', 'mp3', 'opus']:
                 test_file = os.path.join(output_path, f'{download_id}.{ext}')
                 if os.path.exists(test_file):
                     downloaded_file = test_file
@@ -596,90 +1000,236 @@ class VideoDownloader:
             'platform': self._get_platform_from_extractor(info.get('extractor', ''))
         }
 
-    def get_direct_url(self, url: str, quality: str = 'best') -> Optional[Dict]:
-        """Get direct download URL without downloading"""
-        try:
-            # Adjust format based on quality preference
-            format_selector = self._get_format_selector(quality)
+    def iter_playlist_entries(self, url: str, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Yield playlist or channel entries as pages are fetched, using flat extraction"""
+        opts = self.ydl_opts_info.copy()
+        opts.update({
+            'noplaylist': False,
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+        })
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            # process=False keeps entries as a lazy generator instead of a full list
+            info = ydl.extract_info(url, download=False, process=False)
             
-            # Special handling for TikTok URLs
-            opts = self.ydl_opts_download.copy()
-            opts.update({
-                'format': format_selector,
-            })
+            # Channel URLs redirect to their videos tab or playlist
+            redirects = 0
+            while info and info.get('_type') in ('url', 'url_transparent') and redirects < 5:
+                info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+                redirects += 1
             
-            if 'tiktok.com' in url.lower():
-                opts.update({
-                    'extractor_args': {
-                        'tiktok': {
-                            'webpage_download_timeout': 60,
-                            'api_hostname': 'api.tiktokv.com'
-                        }
-                    }
-                })
+            if not info:
+                return
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    return None
-                
-                # Get the best format URL
-                if 'url' in info:
-                    download_url = info['url']
-                elif 'formats' in info and info['formats']:
-                    # Get the selected format
-                    formats = info['formats']
-                    selected_format = formats[-1] if formats else None
-                    download_url = selected_format.get('url') if selected_format else None
-                else:
-                    download_url = None
-                
-                if not download_url:
-                    return None
-                
-                download_info = {
-                    'title': info.get('title', 'Unknown Title'),
-                    'download_url': download_url,
-                    'file_extension': info.get('ext', 'mp4'),
-                    'file_size': info.get('filesize') or info.get('filesize_approx', 0),
-                    'quality': quality,
-                    'format_id': info.get('format_id', ''),
-                    'resolution': info.get('resolution', 'Unknown'),
-                    'fps': info.get('fps', 0),
-                    'duration': info.get('duration', 0),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'platform': self._get_platform_from_extractor(info.get('extractor', ''))
-                }
-                
-                return download_info
-                
-        except Exception as e:
-            logger.warning(f"Primary direct URL extraction failed for {url}: {str(e)}")
-            # Try fallback direct URL extraction
-            return self._try_fallback_direct_url(url, quality)
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                # Single video, expand to itself
+                yield self._format_playlist_entry(info, 0)
+                return
+            
+            for index, entry in enumerate(self._iter_lazy_entries(info.get('entries'))):
+                if limit is not None and index >= limit:
+                    break
+                if entry:
+                    yield self._format_playlist_entry(entry, index)
     
-    def _try_fallback_direct_url(self, url: str, quality: str) -> Optional[Dict]:
-        """Try fallback methods for direct URL extraction"""
-        fallback_methods = [
+    def _iter_lazy_entries(self, entries) -> Iterator[Dict]:
+        """Iterate generator, list or paged playlist entries one page at a time"""
+        if not entries:
+            return
+        
+        if hasattr(entries, 'getslice'):
+            # Paged entries are fetched on demand, one page per slice
+            start = 0
+            page_size = 50
+            while True:
+                page = entries.getslice(start, start + page_size)
+                if not page:
+                    break
+                yield from page
+                start += page_size
+        else:
+            yield from entries
+    
+    def _format_playlist_entry(self, entry: Dict, index: int) -> Dict:
+        """Format flat playlist entry"""
+        thumbnails = entry.get('thumbnails') or []
+        return {
+            'index': index,
+            'video_id': entry.get('id', ''),
+            'title': entry.get('title', 'Unknown Title'),
+            'url': entry.get('webpage_url') or entry.get('url', ''),
+            'duration': entry.get('duration') or 0,
+            'duration_string': self._format_duration(int(entry.get('duration') or 0)),
+            'uploader': entry.get('uploader') or entry.get('channel', ''),
+            'thumbnail': entry.get('thumbnail') or (thumbnails[-1].get('url', '') if thumbnails else ''),
+            'view_count': entry.get('view_count') or 0,
+            'platform': self._get_platform_from_extractor(entry.get('ie_key') or entry.get('extractor', ''))
+        }
+    
+    def get_direct_url(self, url: str, quality: str = 'best') -> Optional[Dict]:
+        """Get direct download URL without downloading"""
+        info_key = self._cache_key(url)
+        return self.single_flight.do(('direct_url', info_key, quality), lambda: self._get_direct_url(url, quality, info_key))
+    
+    def _get_direct_url(self, url: str, quality: str, info_key: tuple) -> Optional[Dict]:
+        """Get direct download URL, answering from the direct URL cache when possible"""
+        cache_key = (info_key, quality)
+        cached_result = self.direct_url_cache.get(cache_key)
+        if cached_result:
+            return cached_result
+        
+        # Any quality can be answered from an already extracted format table
+        result = self._direct_url_from_cached_formats(url, quality, info_key)
+        if result:
+            self._cache_direct_url(cache_key, result)
+            return result
+        
+        direct_url_methods = [
+            self._direct_url_with_default_opts,
             self._direct_url_with_minimal_opts,
             self._direct_url_with_updated_headers,
             self._direct_url_with_basic_opts
         ]
         
-        for i, method in enumerate(fallback_methods):
-            try:
-                logger.info(f"Trying fallback direct URL method {i+1} for {url}")
-                result = method(url, quality)
-                if result:
-                    logger.info(f"Successfully extracted direct URL using fallback method {i+1}")
-                    return result
-            except Exception as e:
-                logger.warning(f"Fallback direct URL method {i+1} failed for {url}: {str(e)}")
-                continue
+        result = self._run_info_strategies('direct URL', url, direct_url_methods, (url, quality))
         
-        logger.error(f"All fallback direct URL methods failed for {url}")
-        return None
+        if result:
+            self._cache_direct_url(cache_key, result)
+        
+        return result
+    
+    def get_direct_url_ladder(self, url: str) -> Optional[Dict]:
+        """Get direct URLs for every supported quality from one extraction"""
+        info_key = self._cache_key(url)
+        return self.single_flight.do(('direct_url_ladder', info_key), lambda: self._get_direct_url_ladder(url, info_key))
+    
+    def _get_direct_url_ladder(self, url: str, info_key: tuple) -> Optional[Dict]:
+        """Build quality ladder from cached metadata, extracting once if needed"""
+        if not self.info_cache.get(info_key) and not self.get_video_info(url):
+            return None
+        
+        qualities = {}
+        for quality in self.QUALITY_FORMATS:
+            cache_key = (info_key, quality)
+            result = self.direct_url_cache.get(cache_key) or self._direct_url_from_cached_formats(url, quality, info_key)
+            if result:
+                self._cache_direct_url(cache_key, result)
+                qualities[quality] = result
+        
+        if not qualities:
+            # Metadata without a usable format table, resolve the default quality the usual way
+            result = self.get_direct_url(url, 'best')
+            if not result:
+                return None
+            qualities['best'] = result
+        
+        first = next(iter(qualities.values()))
+        return {
+            'title': first['title'],
+            'duration': first['duration'],
+            'thumbnail': first['thumbnail'],
+            'platform': first['platform'],
+            'qualities': {
+                quality: {key: value for key, value in result.items()
+                          if key not in ('title', 'duration', 'thumbnail', 'platform', 'quality')}
+                for quality, result in qualities.items()
+            }
+        }
+    
+    def _cache_direct_url(self, cache_key: tuple, result: Dict) -> None:
+        """Cache direct URL result until shortly before its signed URL expires"""
+        ttl = self._get_direct_url_ttl(result['download_url'])
+        if ttl > 0:
+            self.direct_url_cache.set(cache_key, result, ttl=ttl)
+    
+    def _direct_url_from_cached_formats(self, url: str, quality: str, info_key: tuple) -> Optional[Dict]:
+        """Select direct URL from cached metadata without contacting the platform"""
+        cached_info = self.info_cache.get(info_key)
+        if not cached_info:
+            return None
+        
+        format_index = self.format_indexes.get(info_key)
+        if format_index is None:
+            format_index = FormatIndex(cached_info.get('formats') or [])
+            self.format_indexes.set(info_key, format_index)
+        
+        selected_format = self._select_format(format_index, quality)
+        if not selected_format:
+            return None
+        
+        logger.debug(f"Direct URL for {url} at {quality} answered from cached formats")
+        return self._build_direct_url_info(cached_info, selected_format, quality)
+    
+    def is_direct_url_cached(self, url: str, quality: str = 'best') -> bool:
+        """Check if a direct URL can be answered from the cache without extraction"""
+        return self.direct_url_cache.get((self._cache_key(url), quality)) is not None
+    
+    def invalidate_direct_url(self, url: str, quality: str = 'best') -> None:
+        """Drop cached direct URL, e.g. after the CDN rejected it"""
+        cache_key = self._cache_key(url)
+        # Every quality and the cached formats come from the same extraction,
+        # so they carry equally stale signed URLs and the next lookup must extract again
+        for cached_quality in set(self.QUALITY_FORMATS) | {quality}:
+            self.direct_url_cache.delete((cache_key, cached_quality))
+        self.info_cache.delete(cache_key)
+        self.format_indexes.delete(cache_key)
+    
+    def _get_direct_url_ttl(self, download_url: str) -> float:
+        """Get cache lifetime for a signed direct URL from its expiry parameter"""
+        query = parse_qs(urlparse(download_url).query)
+        
+        expires_at = None
+        try:
+            if 'expire' in query:
+                # googlevideo and TikTok CDN URLs
+                expires_at = int(query['expire'][0])
+            elif 'x-expires' in query:
+                # TikTok CDN URLs
+                expires_at = int(query['x-expires'][0])
+            elif 'oe' in query:
+                # Instagram/Facebook CDN URLs carry a hex timestamp
+                expires_at = int(query['oe'][0], 16)
+        except ValueError:
+            expires_at = None
+        
+        if expires_at is None:
+            return self.DIRECT_URL_DEFAULT_TTL
+        
+        ttl = expires_at - time.time() - self.DIRECT_URL_EXPIRY_MARGIN
+        return min(ttl, self.DIRECT_URL_MAX_TTL)
+    
+    def _direct_url_with_default_opts(self, url: str, quality: str) -> Optional[Dict]:
+        """Try direct URL extraction with the default download options"""
+        # Adjust format based on quality preference
+        format_selector = self._get_format_selector(quality)
+        
+        # Special handling for TikTok URLs
+        opts = self.ydl_opts_download.copy()
+        opts.update({
+            'format': format_selector,
+        })
+        
+        if 'tiktok.com' in url.lower():
+            opts.update({
+                'extractor_args': {
+                    'tiktok': {
+                        'webpage_download_timeout': 60,
+                        'api_hostname': 'api.tiktokv.com'
+                    }
+                }
+            })
+        
+        with self.ydl_pool.acquire(opts) as ydl:
+            cached_info = self.info_cache.get(self._cache_key(url))
+            if cached_info:
+                # Re-run format selection on cached metadata
+                info = ydl.process_ie_result(copy.deepcopy(cached_info), download=False)
+            else:
+                info = ydl.extract_info(url, download=False)
+                self._remember_info(url, info)
+            
+            return self._extract_direct_url_info(info, quality)
     
     def _direct_url_with_minimal_opts(self, url: str, quality: str) -> Optional[Dict]:
         """Try direct URL extraction with minimal options"""
@@ -690,7 +1240,7 @@ class VideoDownloader:
             'format': 'best[height<=720]/best',
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
+        with self.ydl_pool.acquire(opts) as ydl:
             info = ydl.extract_info(url, download=False)
             if info:
                 return self._extract_direct_url_info(info, quality)
@@ -710,7 +1260,7 @@ class VideoDownloader:
             }
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
+        with self.ydl_pool.acquire(opts) as ydl:
             info = ydl.extract_info(url, download=False)
             if info:
                 return self._extract_direct_url_info(info, quality)
@@ -723,7 +1273,7 @@ class VideoDownloader:
             'format': 'worst/best',
         }
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
+        with self.ydl_pool.acquire(opts) as ydl:
             info = ydl.extract_info(url, download=False)
             if info:
                 return self._extract_direct_url_info(info, quality)
@@ -734,50 +1284,88 @@ class VideoDownloader:
         if not info:
             return None
         
-        # Get the best format URL
-        download_url = None
-        if 'url' in info:
-            download_url = info['url']
-        elif 'formats' in info and info['formats']:
-            # Get the selected format
-            formats = info['formats']
-            selected_format = formats[-1] if formats else None
-            download_url = selected_format.get('url') if selected_format else None
-        
-        if not download_url:
+        # Select the requested quality from the format table, the strategy's own
+        # format selector may differ from the quality the client asked for
+        selected_format = self._select_format(FormatIndex(info['formats']), quality) if info.get('formats') else None
+        if selected_format is None and info.get('url'):
+            # Single-format result without a format table
+            selected_format = info
+        
+        if not selected_format or not selected_format.get('url'):
             return None
         
+        return self._build_direct_url_info(info, selected_format, quality)
+    
+    def _select_format(self, format_index: FormatIndex, quality: str) -> Optional[Dict]:
+        """Select format for a direct URL, single files are preferred over HLS/DASH manifests"""
+        return format_index.select(quality, SINGLE_FILE_PROTOCOLS) or format_index.select(quality)
+    
+    def _build_direct_url_info(self, info: Dict, selected_format: Dict, quality: str) -> Dict:
+        """Build direct URL response from video info and the selected format"""
+        format_details = FormatIndex.describe(selected_format)
+        
         return {
             'title': info.get('title', 'Unknown Title'),
-            'download_url': download_url,
-            'file_extension': info.get('ext', 'mp4'),
-            'file_size': info.get('filesize') or info.get('filesize_approx', 0),
+            'download_url': selected_format['url'],
+            'file_extension': format_details['ext'],
+            'file_size': format_details['filesize'],
             'quality': quality,
-            'format_id': info.get('format_id', ''),
-            'resolution': info.get('resolution', 'Unknown'),
-            'fps': info.get('fps', 0),
+            'format_id': format_details['format_id'],
+            'resolution': format_details['resolution'],
+            'fps': format_details['fps'],
+            'vcodec': format_details['vcodec'],
+            'acodec': format_details['acodec'],
+            'tbr': format_details['tbr'],
+            'protocol': format_details['protocol'],
             'duration': info.get('duration', 0),
             'thumbnail': info.get('thumbnail', ''),
-            'platform': self._get_platform_from_extractor(info.get('extractor', ''))
+            'platform': self._get_platform_from_extractor(info.get('extractor', '')),
+            'http_headers': selected_format.get('http_headers') or info.get('http_headers', {})
+        }
+    
+    def _cache_key(self, url: str) -> tuple:
+        """Build cache key from platform and video ID or normalized URL"""
+        return self.url_normalizer.cache_key(url)
+    
+    def _remember_info(self, url: str, info) -> None:
+        """Store raw extracted info in the metadata cache"""
+        if not info or not info.get('formats'):
+            return
+        
+        # Drop per-download state so cached info can be processed again
+        cached_info = {
+            key: value for key, value in info.items()
+            if not key.startswith('__') and key not in ('requested_downloads', 'filepath', '_filename', 'filename')
+        }
+        cache_key = self._cache_key(url)
+        self.info_cache.set(cache_key, cached_info)
+        # Rebuilt from the new format table on next use
+        self.format_indexes.delete(cache_key)
+    
+    def get_performance_stats(self) -> Dict:
+        """Get cache, pool, strategy and coalescing statistics"""
+        return {
+            'info_cache': self.info_cache.get_stats(),
+            'direct_url_cache': self.direct_url_cache.get_stats(),
+            'format_indexes': self.format_indexes.get_stats(),
+            'short_link_cache': self.url_normalizer.get_stats(),
+            'ydl_pool': self.ydl_pool.get_stats(),
+            'strategies': self.strategy_stats.get_stats(),
+            'single_flight': self.single_flight.get_stats(),
+            'scheduler': self.scheduler.get_stats(),
+            'partial_downloads': dict(self.partial_stats)
         }
     
     def _extract_tiktok_id_from_url(self, url: str) -> str:
         """Extract TikTok video ID from URL"""
-        import re
-        
-        # Common TikTok URL patterns
-        patterns = [
-            r'tiktok\.com.*?/video/(\d+)',
-            r'vm\.tiktok\.com/([A-Za-z0-9]+)',
-            r'vt\.tiktok\.com/([A-Za-z0-9]+)',
-            r'tiktok\.com/@[^/]+/video/(\d+)',
-            r'/(\d{19,})'  # TikTok video IDs are typically 19 digits
-        ]
+        platform, video_id = self.url_normalizer.normalize(url)
+        if platform == 'tiktok' and video_id:
+            return video_id
         
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        # Unresolved short links are identified by their code
+        short_code = extract_tiktok_short_code(url)
+        if short_code:
+            return short_code
         
         # If no pattern matches, generate from URL hash
         import hashlib
@@ -821,18 +1409,12 @@ class VideoDownloader:
 
     def _get_format_selector(self, quality: str) -> str:
         """Get yt-dlp format selector based on quality preference"""
-        quality_map = {
-            'worst': 'worst',
-            'best': 'best',
-            '720p': 'best[height<=720]/best',
-            '480p': 'best[height<=480]/best',
-            '360p': 'best[height<=360]/best',
-            '240p': 'best[height<=240]/best',
-            'audio': 'bestaudio'
-        }
-        
-        return quality_map.get(quality, 'best[height<=720]/best')
+        return self.QUALITY_FORMATS.get(quality, 'best[height<=720]/best')
 
+    def _get_platform_from_url(self, url: str) -> str:
+        """Get platform name from URL"""
+        return detect_platform(url)
+    
     def _get_platform_from_extractor(self, extractor: str) -> str:
         """Get platform name from yt-dlp extractor"""
         extractor_lower = extractor.lower()
@@ -0,0 +1,97 @@
+import json
+import threading
+import logging
+from typing import Callable, Dict, Optional
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import yt_dlp
+
+logger = logging.getLogger(__name__)
+
+class YoutubeDLPool:
+    def __init__(self, max_idle_per_profile: int = 4, progress_hook: Optional[Callable] = None):
+        """
+        Initialize pool of reusable YoutubeDL instances
+
+        Args:
+            max_idle_per_profile: Maximum number of idle instances kept per option profile
+            progress_hook: Progress hook installed on every instance
+        """
+        self.max_idle_per_profile = max_idle_per_profile
+        self.progress_hook = progress_hook
+        self.idle: Dict[str, deque] = defaultdict(deque)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _profile_key(self, opts: Dict) -> str:
+        """Build pool key from options, output template is applied per checkout"""
+        return json.dumps({k: v for k, v in opts.items() if k != 'outtmpl'}, sort_keys=True, default=str)
+
+    @contextmanager
+    def acquire(self, opts: Dict):
+        """
+        Check out a YoutubeDL instance built with the given options
+
+        Instances are used by one thread at a time and returned to the pool
+        afterwards, so extractors, HTTP connections and cookies are reused.
+
+        Args:
+            opts: yt-dlp options, 'outtmpl' may differ between checkouts
+
+        Yields:
+            YoutubeDL instance
+        """
+        key = self._profile_key(opts)
+
+        ydl = None
+        with self.lock:
+            if self.idle[key]:
+                ydl = self.idle[key].pop()
+                self.reused += 1
+
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({k: v for k, v in opts.items() if k != 'outtmpl'})
+            if self.progress_hook:
+                ydl.add_progress_hook(self.progress_hook)
+            with self.lock:
+                self.created += 1
+            logger.debug(f"Created YoutubeDL instance for new option profile ({self.created} total)")
+
+        default_outtmpl = ydl.params['outtmpl'].get('default')
+        if opts.get('outtmpl'):
+            ydl.params['outtmpl']['default'] = opts['outtmpl']
+
+        try:
+            yield ydl
+        finally:
+            ydl.params['outtmpl']['default'] = default_outtmpl
+            self._release(key, ydl)
+
+    def _release(self, key: str, ydl) -> None:
+        """Return instance to the pool or close it when the pool is full"""
+        with self.lock:
+            if len(self.idle[key]) < self.max_idle_per_profile:
+                self.idle[key].append(ydl)
+                return
+
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.warning(f"Error closing YoutubeDL instance: {str(e)}")
+
+    def get_stats(self) -> Dict:
+        """
+        Get pool statistics
+
+        Returns:
+            Dictionary containing pool statistics
+        """
+        with self.lock:
+            return {
+                'profiles': len(self.idle),
+                'idle_instances': sum(len(instances) for instances in self.idle.values()),
+                'created': self.created,
+                'reused': self.reused
+            }